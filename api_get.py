@@ -15,6 +15,10 @@ from db_helper import (
 )
 
 SCRIPT_DIR = Path(__file__).parent.absolute()
+# Seconds to wait on each request; together the four requests of one update
+# (two UUID lookups at most, player, guild) stay within batch_update's 30 s per user
+UUID_TIMEOUT = 5
+HYPIXEL_TIMEOUT = 10
 
 
 def read_api_key_file() -> Optional[str]:
@@ -84,7 +88,7 @@ def get_uuid(username: str) -> tuple[str, str]:
     """
     # Try Mojang
     try:
-        r = requests.get(f"https://api.mojang.com/users/profiles/minecraft/{username}", timeout=5)
+        r = requests.get(f"https://api.mojang.com/users/profiles/minecraft/{username}", timeout=UUID_TIMEOUT)
         if r.status_code == 200:
             data = r.json()
             return data["id"], data.get("name", username)
@@ -93,7 +97,7 @@ def get_uuid(username: str) -> tuple[str, str]:
         
     # Try PlayerDB fallback
     try:
-        r = requests.get(f"https://playerdb.co/api/player/minecraft/{username}", timeout=5)
+        r = requests.get(f"https://playerdb.co/api/player/minecraft/{username}", timeout=UUID_TIMEOUT)
         if r.status_code == 200:
             data = r.json()
             if data.get('success'):
@@ -110,7 +114,7 @@ def get_hypixel_player(uuid: str, api_key: str) -> Dict:
         "https://api.hypixel.net/v2/player",
         headers={"API-Key": api_key},
         params={"uuid": uuid},
-        timeout=20,
+        timeout=HYPIXEL_TIMEOUT,
     )
     r.raise_for_status()
     return r.json()
@@ -122,7 +126,7 @@ def get_hypixel_guild(uuid: str, api_key: str) -> Dict:
         "https://api.hypixel.net/v2/guild",
         headers={"API-Key": api_key},
         params={"player": uuid},
-        timeout=20,
+        timeout=HYPIXEL_TIMEOUT,
     )
     r.raise_for_status()
     return r.json()
@@ -311,13 +315,15 @@ def save_user_color_and_rank(username: str, rank: Optional[str], guild_tag: Opti
                         guild_hex=guild_color)
 
 
-def api_update_database(username: str, api_key: str, snapshot_sections: set[str] | None = None):
+def api_update_database(username: str, api_key: str, snapshot_sections: set[str] | None = None,
+                        save_guild_debug: bool = True):
     """Update user stats in database from Hypixel API.
     
     Args:
         username: Minecraft username
         api_key: Hypixel API key
         snapshot_sections: Set of periods to snapshot ("session", "daily", "yesterday", "monthly")
+        save_guild_debug: Write the raw guild response to guild_info.json
         
     Returns:
         Dict with update results
@@ -402,11 +408,12 @@ def api_update_database(username: str, api_key: str, snapshot_sections: set[str]
     print(f"[DEBUG] Fetching guild information for {proper_username} (UUID: {uuid})")
     try:
         guild_data = get_hypixel_guild(uuid, api_key)
-        # Save guild data to file for inspection
-        guild_file = SCRIPT_DIR / "guild_info.json"
-        with open(guild_file, 'w') as f:
-            json.dump(guild_data, f, indent=2)
-        print(f"[DEBUG] Guild data saved to guild_info.json")
+        if save_guild_debug:
+            # Save guild data to file for inspection
+            guild_file = SCRIPT_DIR / "guild_info.json"
+            with open(guild_file, 'w') as f:
+                json.dump(guild_data, f, indent=2)
+            print(f"[DEBUG] Guild data saved to guild_info.json")
         guild_tag, guild_color = extract_guild_info(guild_data)
         print(f"[DEBUG] Extracted guild tag: {guild_tag}, color: {guild_color}")
     except requests.exceptions.HTTPError as e:
@@ -471,6 +478,29 @@ def api_update_database(username: str, api_key: str, snapshot_sections: set[str]
     }
 
 
+def run(username: str, snapshot_sections: set[str] | None = None, save_guild_debug: bool = True) -> Dict:
+    """Update a user from the API; the in-process equivalent of running this script.
+    
+    Args:
+        username: Minecraft username
+        snapshot_sections: Set of periods to snapshot ("session", "daily", "yesterday", "monthly")
+        save_guild_debug: Write the raw guild response to guild_info.json; concurrent
+            callers should pass False since they would all overwrite the same file
+        
+    Returns:
+        Dict with update results (see api_update_database)
+    """
+    # Only use the API key from API_KEY.txt (no CLI/env/default fallback)
+    api_key = read_api_key_file()
+    if not api_key:
+        raise RuntimeError(
+            "Missing API key: create API_KEY.txt next to api_get.py containing your Hypixel API key"
+        )
+    
+    return api_update_database(username, api_key, snapshot_sections=snapshot_sections or set(),
+                               save_guild_debug=save_guild_debug)
+
+
 def main():
     parser = argparse.ArgumentParser(description="API-based Wool Games stats to SQLite database")
     parser.add_argument("-ign", "--username", required=True, help="Minecraft IGN")
@@ -480,13 +510,6 @@ def main():
     parser.add_argument("-monthly", action="store_true", help="Take monthly snapshot")
     args = parser.parse_args()
 
-    # Only use the API key from API_KEY.txt (no CLI/env/default fallback)
-    api_key = read_api_key_file()
-    if not api_key:
-        raise RuntimeError(
-            "Missing API key: create API_KEY.txt next to api_get.py containing your Hypixel API key"
-        )
-    
     sections = set()
     if args.session:
         sections.add("session")
@@ -497,7 +520,7 @@ def main():
     if args.monthly:
         sections.add("monthly")
 
-    res = api_update_database(args.username, api_key, snapshot_sections=sections)
+    res = run(args.username, sections)
     print(json.dumps(res, default=str))
 
 
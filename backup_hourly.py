@@ -16,19 +16,217 @@ Setup with Task Scheduler (Windows):
     - Action: Start program python.exe
     - Arguments: backup_hourly.py
     - Start in: /home/timothy/backup
+
+Backups with identical contents are hardlinks to one read-only file in
+backups/blobs/. To restore, COPY a backup over stats.db (e.g. cp, not mv or
+ln); moving or linking it would make the live database share its inode with
+the blob and every other backup of the same contents.
 """
 
+import errno
+import hashlib
 import os
 import shutil
+import sqlite3
+import stat
+import sys
+import tempfile
+import traceback
 from pathlib import Path
 from datetime import datetime, timedelta
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
 # Configuration
 SCRIPT_DIR = Path(__file__).parent.absolute()
 DB_FILE = SCRIPT_DIR / "stats.db"
 BACKUP_DIR = SCRIPT_DIR / "backups"
 BACKUP_RETENTION_HOURS = 24
 
+# ioctl(2) request number for FICLONE (see linux/fs.h)
+FICLONE = 0x40049409
+
+
+def reflink_copy(src: Path, dst: Path) -> bool:
+    """Clone src to dst by sharing extents (btrfs, XFS reflink, ...).
+    
+    This is a metadata-only operation, so it costs the same regardless of
+    file size. Leaves no partial file behind on failure.
+    
+    Returns:
+        bool: True if the clone succeeded, False if the filesystem or
+        platform does not support it
+    """
+    if fcntl is None or not sys.platform.startswith("linux"):
+        return False
+    
+    try:
+        with open(src, 'rb') as s, open(dst, 'wb') as d:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        shutil.copystat(src, dst)
+        return True
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.ENOSYS):
+            print(f"[FALLBACK] Reflink failed: {e}")
+        try:
+            dst.unlink()
+        except FileNotFoundError:
+            pass
+        return False
+
+
+def checkpoint_wal():
+    """Copy committed pages from stats.db-wal back into stats.db.
+    
+    The database runs in WAL mode, so recent commits can live only in the -wal
+    file until a checkpoint. A file-level copy of stats.db would miss them.
+    """
+    try:
+        conn = sqlite3.connect(DB_FILE, timeout=30)
+        try:
+            busy, _, _ = conn.execute("PRAGMA wal_checkpoint(FULL)").fetchone()
+        finally:
+            conn.close()
+        if busy:
+            print(f"[WARN] WAL checkpoint could not complete, backup may miss the latest writes")
+    except sqlite3.Error as e:
+        print(f"[WARN] WAL checkpoint failed: {e}")
+
+
+def source_digest() -> str:
+    """Return the SHA-256 of stats.db, reusing the last hash if the file is unchanged.
+    
+    The hash is cached in BACKUP_DIR/.last_hash keyed on the size and mtime of
+    stats.db (and its -wal file), so idle hours don't re-read the database.
+    """
+    signature = []
+    for path in (DB_FILE, DB_FILE.with_name(DB_FILE.name + "-wal")):
+        if path.exists():
+            st = path.stat()
+            signature.append(f"{st.st_size}:{st.st_mtime_ns}")
+    signature = " ".join(signature)
+    
+    cache_file = BACKUP_DIR / ".last_hash"
+    try:
+        cached_signature, cached_digest = cache_file.read_text().rsplit(" ", 1)
+        if cached_signature == signature:
+            print(f"[BACKUP] Database unchanged since last run, reusing cached hash")
+            return cached_digest
+    except (OSError, ValueError):
+        pass
+    
+    with open(DB_FILE, 'rb') as f:
+        digest = hashlib.file_digest(f, "sha256").hexdigest()
+    try:
+        cache_file.write_text(f"{signature} {digest}")
+    except OSError as e:
+        print(f"[WARN] Could not cache backup hash: {e}")
+    return digest
+
+
+def copy_with_fallbacks(src: Path, dst: Path) -> bool:
+    """Copy src to dst, trying progressively simpler methods.
+    
+    Returns:
+        bool: True if any copy method succeeded, False otherwise
+    """
+    copy_success = False
+    
+    # Method 0: Try a reflink clone (copy-on-write filesystems only)
+    if reflink_copy(src, dst):
+        copy_success = True
+        print(f"[BACKUP] Copy method: reflink")
+    
+    if not copy_success:
+        # Method 1: Try shutil.copy2 (preserves metadata)
+        try:
+            shutil.copy2(src, dst)
+            copy_success = True
+            print(f"[BACKUP] Copy method: shutil.copy2")
+        except Exception as e:
+            print(f"[FALLBACK] shutil.copy2 failed: {e}, trying alternative...")
+        
+            # Method 2: Try shutil.copy (without metadata)
+            try:
+                shutil.copy(src, dst)
+                copy_success = True
+                print(f"[FALLBACK] Copy method: shutil.copy")
+            except Exception as e2:
+                print(f"[FALLBACK] shutil.copy failed: {e2}, trying sendfile...")
+            
+                # Method 3: In-kernel copy, no userspace buffer
+                try:
+                    with open(src, 'rb') as s:
+                        with open(dst, 'wb') as d:
+                            remaining = os.fstat(s.fileno()).st_size
+                            offset = 0
+                            while remaining > 0:
+                                sent = os.sendfile(d.fileno(), s.fileno(), offset, remaining)
+                                if sent == 0:
+                                    break
+                                offset += sent
+                                remaining -= sent
+                    copy_success = True
+                    print(f"[FALLBACK] Copy method: sendfile")
+                except Exception as e3:
+                    print(f"[FALLBACK] sendfile failed: {e3}, trying manual read/write...")
+                
+                    # Method 4: Manual byte copy
+                    try:
+                        with open(src, 'rb') as s:
+                            with open(dst, 'wb') as d:
+                                shutil.copyfileobj(s, d)
+                        copy_success = True
+                        print(f"[FALLBACK] Copy method: manual byte copy")
+                    except Exception as e4:
+                        print(f"[ERROR] All copy methods failed: {e4}")
+                        return False
+    
+    return copy_success
+
+
+def copy_to_blob(blob_dir: Path, digest: str) -> Path | None:
+    """Copy stats.db into blob_dir under the SHA-256 of the bytes actually copied.
+    
+    The copy goes to a temporary file first and is only renamed into place once
+    it is complete, so an interrupted run never leaves a truncated blob that
+    later runs would reuse. If the database changed after digest was computed,
+    the blob is named after the copied contents rather than digest.
+    
+    Args:
+        blob_dir: Directory holding the content-addressed blobs
+        digest: SHA-256 of stats.db computed before the copy
+    
+    Returns:
+        Path of the blob, or None if the copy failed
+    """
+    fd, tmp_name = tempfile.mkstemp(dir=blob_dir, prefix=".partial-", suffix=".db")
+    os.close(fd)
+    tmp_path = Path(tmp_name)
+    try:
+        if not copy_with_fallbacks(DB_FILE, tmp_path):
+            return None
+        
+        with open(tmp_path, 'rb') as f:
+            copied_digest = hashlib.file_digest(f, "sha256").hexdigest()
+        if copied_digest != digest:
+            print(f"[WARN] stats.db changed while it was copied, storing blob as sha256 {copied_digest[:12]}")
+        
+        blob_path = blob_dir / f"{copied_digest}.db"
+        os.replace(tmp_path, blob_path)
+        return blob_path
+    except Exception as e:
+        print(f"[ERROR] Failed to store backup blob: {e}")
+        return None
+    finally:
+        try:
+            tmp_path.unlink()
+        except FileNotFoundError:
+            pass
+
 
 def create_backup() -> bool:
     """Create an hourly backup of stats.db with timestamp.
@@ -36,6 +234,7 @@ def create_backup() -> bool:
     Returns:
         bool: True if backup succeeded, False otherwise
     """
+    global BACKUP_DIR
     try:
         print(f"[BACKUP] Script directory: {SCRIPT_DIR}")
         print(f"[BACKUP] Database file path: {DB_FILE}")
@@ -54,13 +253,11 @@ def create_backup() -> bool:
             fallback_dir = Path.home() / "backup_api_backups"
             print(f"[FALLBACK] Cannot create {BACKUP_DIR}, trying {fallback_dir}")
             fallback_dir.mkdir(exist_ok=True, mode=0o755)
-            global BACKUP_DIR
             BACKUP_DIR = fallback_dir
             print(f"[FALLBACK] Using alternate backup directory: {BACKUP_DIR}")
         except Exception as e:
             print(f"[ERROR] Failed to create backup directory: {e}")
             # Last resort: use temp directory
-            import tempfile
             BACKUP_DIR = Path(tempfile.gettempdir()) / "api_backups"
             BACKUP_DIR.mkdir(exist_ok=True)
             print(f"[FALLBACK] Using temporary directory: {BACKUP_DIR}")
@@ -80,36 +277,30 @@ def create_backup() -> bool:
             print(f"[SKIP] Backup already exists: {backup_filename}")
             return True
         
-        # Copy the file with fallback methods
-        print(f"[BACKUP] Creating backup: {backup_filename}")
-        copy_success = False
+        # Identical database contents share one blob; each hourly name is a hardlink to it
+        blob_dir = BACKUP_DIR / "blobs"
+        blob_dir.mkdir(exist_ok=True)
+        checkpoint_wal()
+        digest = source_digest()
+        blob_path = blob_dir / f"{digest}.db"
         
-        # Method 1: Try shutil.copy2 (preserves metadata)
-        try:
-            shutil.copy2(DB_FILE, backup_path)
+        print(f"[BACKUP] Creating backup: {backup_filename} (sha256 {digest[:12]})")
+        if blob_path.exists():
+            print(f"[BACKUP] Contents unchanged since an earlier backup, reusing blob")
             copy_success = True
-            print(f"[BACKUP] Copy method: shutil.copy2")
-        except Exception as e:
-            print(f"[FALLBACK] shutil.copy2 failed: {e}, trying alternative...")
-            
-            # Method 2: Try shutil.copy (without metadata)
-            try:
-                shutil.copy(DB_FILE, backup_path)
-                copy_success = True
-                print(f"[FALLBACK] Copy method: shutil.copy")
-            except Exception as e2:
-                print(f"[FALLBACK] shutil.copy failed: {e2}, trying manual read/write...")
-                
-                # Method 3: Manual byte copy
-                try:
-                    with open(DB_FILE, 'rb') as src:
-                        with open(backup_path, 'wb') as dst:
-                            dst.write(src.read())
-                    copy_success = True
-                    print(f"[FALLBACK] Copy method: manual byte copy")
-                except Exception as e3:
-                    print(f"[ERROR] All copy methods failed: {e3}")
-                    return False
+        else:
+            blob_path = copy_to_blob(blob_dir, digest)
+            if blob_path is None:
+                return False
+            copy_success = True
+        
+        # Read-only, since every backup linked to the blob shares its contents
+        os.chmod(blob_path, 0o444)
+        try:
+            os.link(blob_path, backup_path)
+        except OSError as e:
+            print(f"[FALLBACK] Hardlink failed: {e}, copying blob instead")
+            copy_success = copy_with_fallbacks(blob_path, backup_path)
         
         if copy_success:
             # Verify the backup was created and has content
@@ -124,11 +315,33 @@ def create_backup() -> bool:
         
     except Exception as e:
         print(f"[ERROR] Unexpected error during backup: {e}")
-        import traceback
         traceback.print_exc()
         return False
 
 
+def remove_file(path: str):
+    """Delete a backup or blob, clearing the read-only bit first where unlink requires it (Windows)."""
+    try:
+        os.unlink(path)
+    except PermissionError:
+        os.chmod(path, stat.S_IWRITE | stat.S_IREAD)
+        os.unlink(path)
+
+
+def scan_backups(directory: Path, prefix: str = "stats_", suffix: str = ".db") -> list[os.DirEntry]:
+    """List backup files in directory with a single os.scandir() pass.
+    
+    The name filter and is_file() come from the directory listing itself. On
+    POSIX, DirEntry.stat() still costs one stat call per entry the first time
+    it is called (the result is then cached), so callers should only stat the
+    entries they actually need to inspect.
+    """
+    if not directory.exists():
+        return []
+    with os.scandir(directory) as it:
+        return [e for e in it if e.name.startswith(prefix) and e.name.endswith(suffix) and e.is_file()]
+
+
 def cleanup_old_backups():
     """Delete backups older than BACKUP_RETENTION_HOURS."""
     try:
@@ -138,19 +351,23 @@ def cleanup_old_backups():
         
         now = datetime.now()
         cutoff = now - timedelta(hours=BACKUP_RETENTION_HOURS)
+        # Backup names are fixed-width timestamps, so name order is chronological order.
+        # Hardlinked backups share their blob's mtime, so age has to come from the name anyway.
+        cutoff_name = f"stats_{cutoff.strftime('%Y-%m-%d_%H-00-00')}.db"
         deleted_count = 0
         kept_count = 0
         
         print(f"[CLEANUP] Scanning for backups older than {cutoff.strftime('%Y-%m-%d %H:%M:%S')}")
         
-        for backup_file in BACKUP_DIR.glob("stats_*.db"):
+        for backup_file in scan_backups(BACKUP_DIR):
             try:
-                # Get file modification time
-                mtime = datetime.fromtimestamp(backup_file.stat().st_mtime)
+                if len(backup_file.name) != len(cutoff_name):
+                    print(f"[CLEANUP] Skipping unrecognised file: {backup_file.name}")
+                    continue
                 
-                if mtime < cutoff:
-                    backup_file.unlink()
-                    print(f"[CLEANUP] Deleted old backup: {backup_file.name} (from {mtime.strftime('%Y-%m-%d %H:%M:%S')})")
+                if backup_file.name < cutoff_name:
+                    remove_file(backup_file.path)
+                    print(f"[CLEANUP] Deleted old backup: {backup_file.name}")
                     deleted_count += 1
                 else:
                     kept_count += 1
@@ -158,7 +375,22 @@ def cleanup_old_backups():
                 print(f"[CLEANUP] Error processing {backup_file.name}: {e}")
         
         print(f"[CLEANUP] Deleted {deleted_count} old backup(s), kept {kept_count} recent backup(s)")
-        
+
+        # Blobs whose only remaining link is the blob itself are no longer referenced;
+        # this also sweeps .partial-*.db files left behind by an interrupted copy
+        freed_blobs = 0
+        freed_bytes = 0
+        for blob in scan_backups(BACKUP_DIR / "blobs", prefix=""):
+            try:
+                st = blob.stat()
+                if st.st_nlink <= 1:
+                    remove_file(blob.path)
+                    freed_blobs += 1
+                    freed_bytes += st.st_size
+            except Exception as e:
+                print(f"[CLEANUP] Error processing blob {blob.name}: {e}")
+        print(f"[CLEANUP] Removed {freed_blobs} unreferenced blob(s), freed {freed_bytes} bytes")
+
     except Exception as e:
         print(f"[ERROR] Cleanup failed: {e}")
 
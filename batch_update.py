@@ -1,41 +1,117 @@
+import io
 import os
 import subprocess
 import sys
 import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 # Import database helper
 from db_helper import rotate_daily_to_yesterday, reset_weekly_snapshots, get_tracked_users
 
+# Run api_get in-process when possible to avoid starting an interpreter per user
+try:
+    import api_get
+except ImportError:
+    api_get = None
+
 SCRIPT_DIR = Path(__file__).parent.absolute()
+# Each api_get.py run is dominated by Hypixel API latency, so users are updated concurrently.
+# Hypixel keys are limited to 300 requests per 5 minutes and every user costs two (player +
+# guild); a few workers hide request latency, more only run into 429 responses sooner.
+MAX_WORKERS = 4
+# Seconds allowed for one user's update in the subprocess fallback. In-process updates
+# are bounded by the timeouts on api_get's HTTP requests instead.
+API_CALL_TIMEOUT = 30
+# Command prefix for the subprocess fallback; only the username and flags vary per user
+API_GET_CMD = (sys.executable, "api_get.py")
 # TRACKED_FILE = str(SCRIPT_DIR / "tracked_users.txt")  # Now using database
 
 
+class _ThreadOutput:
+    """sys.stdout stand-in that sends a thread's writes to its own buffer while one is set.
+    
+    api_get prints progress as it runs; with several in-process workers that output
+    would interleave on stdout. Each worker collects its own instead, and it is only
+    shown when the update fails, like the captured output of the subprocess path.
+    """
+    
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+    
+    def write(self, text):
+        buffer = getattr(self.local, 'buffer', None)
+        return (self.stream if buffer is None else buffer).write(text)
+    
+    def flush(self):
+        if getattr(self.local, 'buffer', None) is None:
+            self.stream.flush()
+    
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
 def load_tracked_users() -> list[str]:
     """Load tracked usernames from database."""
     return get_tracked_users()
 
 
 def run_api_get(username: str, api_key: str, snapshot_flags: list[str]) -> bool:
-    """Run api_get.py for a user with given snapshot flags.
+    """Run api_get for a user with given snapshot flags.
+    
+    Note: api_key parameter is ignored since api_get only reads from API_KEY.txt
+    
+    Returns True if successful, False otherwise.
+    """
+    if api_get is None:
+        return run_api_get_subprocess(username, snapshot_flags)
+    
+    output = io.StringIO()
+    router = sys.stdout if isinstance(sys.stdout, _ThreadOutput) else None
+    if router is not None:
+        router.local.buffer = output
+    try:
+        # Flags are api_get.py command line switches ("-daily" -> "daily").
+        # Workers run concurrently, so skip the shared guild_info.json debug dump.
+        api_get.run(username, {flag.lstrip('-') for flag in snapshot_flags}, save_guild_debug=False)
+        return True
+    except Exception as e:
+        error = e
+    finally:
+        if router is not None:
+            router.local.buffer = None
     
-    Note: api_key parameter is ignored since api_get.py only reads from API_KEY.txt
+    print(f"[ERROR] api_get failed for {username}: {error}", flush=True)
+    if output.getvalue():
+        print(f"  output: {output.getvalue()}", flush=True)
+    return False
+
+
+def update_user(idx: int, total: int, username: str, api_key: str, snapshot_flags: list[str]) -> bool:
+    """Pool worker: announce the user when its update actually starts, then run api_get."""
+    print(f"[RUN] [{idx}/{total}] {username} - updating stats and taking snapshots: {', '.join(snapshot_flags)}", flush=True)
+    return run_api_get(username, api_key, snapshot_flags)
+
+
+def run_api_get_subprocess(username: str, snapshot_flags: list[str]) -> bool:
+    """Run api_get.py in a separate interpreter (used when it cannot be imported).
     
     Returns True if successful, False otherwise.
     """
     try:
-        cmd = [sys.executable, "api_get.py", "-ign", username]
         # api_get.py doesn't accept -key parameter, it only reads from API_KEY.txt
-        cmd.extend(snapshot_flags)
+        cmd = [*API_GET_CMD, "-ign", username, *snapshot_flags]
         
-        result = subprocess.run(cmd, cwd=str(SCRIPT_DIR), capture_output=True, text=True, timeout=30)
+        result = subprocess.run(cmd, cwd=str(SCRIPT_DIR), capture_output=True, text=True, timeout=API_CALL_TIMEOUT)
         if result.returncode != 0:
             print(f"[ERROR] api_get.py failed for {username}", flush=True)
             print(f"  stdout: {result.stdout}", flush=True)
             print(f"  stderr: {result.stderr}", flush=True)
         return result.returncode == 0
     except subprocess.TimeoutExpired:
-        print(f"[ERROR] api_get.py timed out for {username} after 30 seconds", flush=True)
+        print(f"[ERROR] api_get.py timed out for {username} after {API_CALL_TIMEOUT} seconds", flush=True)
         return False
     except Exception as e:
         print(f"[ERROR] Failed to run api_get.py for {username}: {e}", flush=True)
@@ -55,8 +131,7 @@ def batch_update(schedule: str, api_key: str | None = None) -> dict:
     # Special handling for 'yesterday' schedule - rotate daily->yesterday without API calls
     if schedule == 'yesterday':
         print("[INFO] Running yesterday rotation (copying daily->yesterday snapshots)", flush=True)
-        users = load_tracked_users()
-        results = rotate_daily_to_yesterday(users)
+        results = rotate_daily_to_yesterday()
         # Return results in the expected format
         return {username: (success, ['rotate']) for username, success in results.items()}
     
@@ -88,26 +163,40 @@ def batch_update(schedule: str, api_key: str | None = None) -> dict:
     }
     
     print(f"[INFO] Processing {len(users)} tracked users with schedule '{schedule}'...", flush=True)
-    for idx, username in enumerate(users, 1):
-        snapshots_to_take = schedule_map.get(schedule, [])
-        
-        if not snapshots_to_take:
+    snapshots_to_take = schedule_map.get(schedule, [])
+    
+    if not snapshots_to_take:
+        for username in users:
             print(f"[SKIP] {username} - invalid schedule", flush=True)
             results[username] = (True, [])
-            continue
-        
-        print(f"[RUN] [{idx}/{len(users)}] {username} - updating stats and taking snapshots: {', '.join(snapshots_to_take)}", flush=True)
-        
-        # Always update current stats first (lifetime values), then take snapshots
-        # This ensures the all-time stats are fresh before calculating deltas
-        success = run_api_get(username, api_key, snapshots_to_take)
-        
-        if success:
-            print(f"[OK] {username} - success", flush=True)
-            results[username] = (True, snapshots_to_take)
-        else:
-            print(f"[ERROR] {username} - failed", flush=True)
-            results[username] = (False, snapshots_to_take)
+        return results
+    
+    total = len(users)
+    
+    # Collect each in-process worker's api_get output separately (see _ThreadOutput)
+    stdout = sys.stdout
+    sys.stdout = _ThreadOutput(stdout)
+    try:
+        with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, total)) as pool:
+            futures = {}
+            for idx, username in enumerate(users, 1):
+                # Always update current stats first (lifetime values), then take snapshots
+                # This ensures the all-time stats are fresh before calculating deltas
+                futures[pool.submit(update_user, idx, total, username, api_key, snapshots_to_take)] = username
+            
+            for future in as_completed(futures):
+                username = futures[future]
+                if future.result():
+                    print(f"[OK] {username} - success", flush=True)
+                    results[username] = (True, snapshots_to_take)
+                else:
+                    print(f"[ERROR] {username} - failed", flush=True)
+                    results[username] = (False, snapshots_to_take)
+    finally:
+        sys.stdout = stdout
+    
+    # Report in tracked-user order rather than completion order
+    results = {username: results[username] for username in users}
     
     print(f"\n[SUMMARY] Completed {sum(1 for s, _ in results.values() if s)}/{len(users)} users successfully", flush=True)
     return results
@@ -36,8 +36,12 @@ def migrate_colors():
     conn = sqlite3.connect(DB_FILE)
     cursor = conn.cursor()
     
+    # Map lowercase name -> stored casing once, instead of a lookup per entry
+    cursor.execute("SELECT username FROM user_meta")
+    existing = {row[0].lower(): row[0] for row in cursor.fetchall()}
+    
+    rows = []
     updated_count = 0
-    inserted_count = 0
     
     for username, color in colors_data.items():
         # Handle potential nested structure or simple key-value
@@ -52,28 +56,23 @@ def migrate_colors():
         # Ensure hex format starts with #
         if not hex_color.startswith('#'):
             hex_color = f"#{hex_color}"
-            
-        # Check if user exists in user_meta
-        cursor.execute("SELECT 1 FROM user_meta WHERE LOWER(username) = LOWER(?)", (username,))
-        exists = cursor.fetchone()
         
-        if exists:
-            cursor.execute("""
-                UPDATE user_meta 
-                SET ign_color = ? 
-                WHERE LOWER(username) = LOWER(?)
-            """, (hex_color, username))
+        # Reuse the existing casing so the upsert hits the existing row
+        stored_name = existing.get(username.lower())
+        if stored_name is not None:
             updated_count += 1
         else:
-            # Insert new record if user doesn't exist
-            cursor.execute("""
-                INSERT INTO user_meta (username, ign_color)
-                VALUES (?, ?)
-            """, (username, hex_color))
-            inserted_count += 1
-            
-    conn.commit()
+            stored_name = existing[username.lower()] = username
+        rows.append((stored_name, hex_color))
+    
+    with conn:
+        cursor.executemany("""
+            INSERT INTO user_meta (username, ign_color)
+            VALUES (?, ?)
+            ON CONFLICT(username) DO UPDATE SET ign_color = excluded.ign_color
+        """, rows)
     conn.close()
+    inserted_count = len(rows) - updated_count
     
     print(f"[SUCCESS] Migration complete.\n  Updated: {updated_count}\n  Inserted: {inserted_count}")
 
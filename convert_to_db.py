@@ -5,7 +5,7 @@ This script extracts all data from the Excel file and migrates it to SQLite.
 """
 
 import sqlite3
-import openpyxl
+import pandas as pd
 from pathlib import Path
 import sys
 import argparse
@@ -17,29 +17,71 @@ from db_helper import init_database
 EXCEL_FILE = Path(__file__).parent / "stats.xlsx"
 DB_FILE = Path(__file__).parent / "stats.db"
 
+PERIOD_COLUMNS = ['lifetime', 'session', 'daily', 'yesterday', 'monthly']
+
+# Upserts update existing rows in place instead of deleting and re-inserting them.
+# Kept as constants so sqlite3's statement cache compiles each one only once.
+UPSERT_META_SQL = '''
+    INSERT INTO user_meta (username, level, icon, ign_color, guild_tag, guild_hex)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(username) DO UPDATE SET
+        level = excluded.level,
+        icon = excluded.icon,
+        ign_color = excluded.ign_color,
+        guild_tag = excluded.guild_tag,
+        guild_hex = excluded.guild_hex
+'''
+
+UPSERT_STAT_SQL = '''
+    INSERT INTO user_stats (username, stat_name, lifetime, session, daily, yesterday, monthly)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(username, stat_name) DO UPDATE SET
+        lifetime = excluded.lifetime,
+        session = excluded.session,
+        daily = excluded.daily,
+        yesterday = excluded.yesterday,
+        monthly = excluded.monthly
+'''
+
+# Remembers which stats.xlsx was last imported. stats.db's own mtime can't be used
+# for that, since the bot writes the database all the time.
+IMPORT_STATE_SQL = '''
+    CREATE TABLE IF NOT EXISTS import_state (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    )
+'''
+
+def cell_value(val):
+    """Return None for empty cells (NaN in a DataFrame), otherwise the value."""
+    return None if pd.isna(val) else val
+
 def extract_excel_data(excel_path):
-    """Extract all data from stats.xlsx."""
+    """Extract all data from stats.xlsx.
+    
+    Returns:
+        Tuple of (user_meta, stats): user_meta maps username to its metadata dict,
+        stats is one DataFrame with a row per (username, stat_name) and a float64
+        column per period.
+    """
     if not excel_path.exists():
         print(f"[ERROR] Excel file not found: {excel_path}")
         sys.exit(1)
     
     print(f"[EXCEL] Loading {excel_path}...")
-    wb = openpyxl.load_workbook(excel_path, data_only=True)
+    # One DataFrame per sheet; numeric coercion below runs vectorized instead of per cell
+    sheets = pd.read_excel(excel_path, sheet_name=None, header=None, engine="openpyxl")
     
-    all_users_data = {}
+    user_meta = {}
+    stat_frames = []
     
-    for sheet_name in wb.sheetnames:
+    for sheet_name, df in sheets.items():
         if sheet_name == "Template":
             continue
         
-        sheet = wb[sheet_name]
         username = sheet_name
-        
-        # Initialize user data
-        user_data = {
-            'stats': {},
-            'meta': {}
-        }
+        # Pad narrow sheets so every column referenced below exists
+        df = df.reindex(columns=range(10))
         
         # Extract metadata from first few rows
         # Row 1: Username (A1), Level value (B1)
@@ -50,25 +92,24 @@ def extract_excel_data(excel_path):
         # Row 6: Guild Hex (A6), Hex value (B6)
         
         try:
-            level_val = sheet.cell(row=2, column=2).value
+            meta_vals = [cell_value(val) for val in df[1].iloc[:6]]
+            meta_vals += [None] * (6 - len(meta_vals))
+            _, level_val, icon_val, color_val, guild_tag, guild_hex = meta_vals
+            
+            meta = {}
             if level_val and isinstance(level_val, (int, float)):
-                user_data['meta']['level'] = int(level_val)
+                meta['level'] = int(level_val)
             else:
-                user_data['meta']['level'] = 0
+                meta['level'] = 0
                 
-            icon_val = sheet.cell(row=3, column=2).value
-            user_data['meta']['icon'] = str(icon_val) if icon_val else ''
-            
-            color_val = sheet.cell(row=4, column=2).value
-            user_data['meta']['ign_color'] = str(color_val) if color_val else None
-            
-            guild_tag = sheet.cell(row=5, column=2).value
-            user_data['meta']['guild_tag'] = str(guild_tag) if guild_tag else None
-            
-            guild_hex = sheet.cell(row=6, column=2).value
-            user_data['meta']['guild_hex'] = str(guild_hex) if guild_hex else None
+            meta['icon'] = str(icon_val) if icon_val else ''
+            meta['ign_color'] = str(color_val) if color_val else None
+            meta['guild_tag'] = str(guild_tag) if guild_tag else None
+            meta['guild_hex'] = str(guild_hex) if guild_hex else None
+            user_meta[username] = meta
         except Exception as e:
             print(f"[WARN] Error extracting metadata for {username}: {e}")
+            user_meta[username] = {}
         
         # Extract stats starting from row 2 (row 1 has headers)
         # Column A: Stat name
@@ -82,88 +123,91 @@ def extract_excel_data(excel_path):
         # Column I: Monthly Delta
         # Column J: Monthly value (snapshot)
         
-        for row_idx in range(2, sheet.max_row + 1):
-            stat_name_cell = sheet.cell(row=row_idx, column=1).value
-            
-            if not stat_name_cell:
-                continue
-            
-            stat_name = str(stat_name_cell).strip()
-            if not stat_name:
-                continue
-            
-            # Extract values for each period
-            lifetime_val = sheet.cell(row=row_idx, column=2).value  # Column B
-            session_val = sheet.cell(row=row_idx, column=4).value   # Column D
-            daily_val = sheet.cell(row=row_idx, column=6).value     # Column F
-            yesterday_val = sheet.cell(row=row_idx, column=8).value # Column H
-            monthly_val = sheet.cell(row=row_idx, column=10).value  # Column J
-            
-            # Convert to float, default to 0 if None or invalid
-            def safe_float(val):
-                try:
-                    return float(val) if val is not None else 0.0
-                except (ValueError, TypeError):
-                    return 0.0
-            
-            user_data['stats'][stat_name] = {
-                'lifetime': safe_float(lifetime_val),
-                'session': safe_float(session_val),
-                'daily': safe_float(daily_val),
-                'yesterday': safe_float(yesterday_val),
-                'monthly': safe_float(monthly_val)
-            }
+        stats = df.iloc[1:, [0, 1, 3, 5, 7, 9]]
+        stats.columns = ['stat'] + PERIOD_COLUMNS
+        
+        stat_names = stats['stat'].map(lambda val: str(val).strip() if cell_value(val) else '')
+        stats = stats[stat_names != '']
+        stat_names = stat_names[stat_names != '']
+        
+        # Convert to float, default to 0 if empty or invalid
+        values = stats[PERIOD_COLUMNS].apply(pd.to_numeric, errors='coerce').fillna(0.0).astype(float)
+        # Make stat_name lowercase for consistency
+        values.insert(0, 'stat_name', stat_names.astype(str).str.lower())
+        values.insert(0, 'username', username)
+        stat_frames.append(values)
         
-        all_users_data[username] = user_data
-        print(f"[EXCEL] Extracted data for {username}: {len(user_data['stats'])} stats")
+        print(f"[EXCEL] Extracted data for {username}: {stat_names.nunique()} stats")
     
-    wb.close()
-    print(f"[EXCEL] Extraction complete. Total users: {len(all_users_data)}")
-    return all_users_data
+    # Keep stats column-wise (one array per period) rather than a dict per stat
+    columns = ['username', 'stat_name'] + PERIOD_COLUMNS
+    stats = pd.concat(stat_frames, ignore_index=True) if stat_frames else pd.DataFrame(columns=columns)
+    
+    print(f"[EXCEL] Extraction complete. Total users: {len(user_meta)}")
+    return user_meta, stats
+
+def excel_signature(excel_path):
+    """Size and modification time identifying one version of the Excel file."""
+    st = excel_path.stat()
+    return f"{st.st_size}:{st.st_mtime_ns}"
 
-def insert_data_to_db(conn, all_users_data):
-    """Insert all extracted data into the database."""
+def get_imported_excel_signature(conn):
+    """Return the excel_signature of the last stats.xlsx imported into this database, or None."""
+    row = conn.execute("SELECT value FROM import_state WHERE key = 'excel_signature'").fetchone()
+    return row[0] if row else None
+
+def set_imported_excel_signature(conn, signature):
+    """Record which version of stats.xlsx was just imported."""
+    conn.execute(
+        "INSERT OR REPLACE INTO import_state (key, value) VALUES ('excel_signature', ?)",
+        (signature,)
+    )
+
+def insert_data_to_db(conn, user_meta, stats):
+    """Insert all extracted data into the database in a single transaction."""
     cursor = conn.cursor()
     
-    stats_inserted = 0
-    users_inserted = 0
-    
-    for username, user_data in all_users_data.items():
-        # Insert metadata
-        meta = user_data['meta']
-        cursor.execute('''
-            INSERT OR REPLACE INTO user_meta (username, level, icon, ign_color, guild_tag, guild_hex)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (
+    meta_rows = [
+        (
             username,
             meta.get('level', 0),
             meta.get('icon', ''),
             meta.get('ign_color'),
             meta.get('guild_tag'),
             meta.get('guild_hex')
-        ))
-        users_inserted += 1
-        
-        # Insert stats
-        for stat_name, periods in user_data['stats'].items():
-            # Make stat_name lowercase for consistency
-            stat_name_lower = stat_name.lower()
-            cursor.execute('''
-                INSERT OR REPLACE INTO user_stats (username, stat_name, lifetime, session, daily, yesterday, monthly)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                username,
-                stat_name_lower,
-                periods['lifetime'],
-                periods['session'],
-                periods['daily'],
-                periods['yesterday'],
-                periods['monthly']
-            ))
-            stats_inserted += 1
+        )
+        for username, meta in user_meta.items()
+    ]
+    # Rows are zipped straight off the column arrays
+    stat_rows = zip(*(stats[col].to_numpy() for col in ['username', 'stat_name'] + PERIOD_COLUMNS))
+    
+    cursor.execute('BEGIN')
+    try:
+        cursor.executemany(UPSERT_META_SQL, meta_rows)
+        cursor.executemany(UPSERT_STAT_SQL, stat_rows)
+        cursor.execute('COMMIT')
+    except Exception:
+        cursor.execute('ROLLBACK')
+        raise
     
-    conn.commit()
-    print(f"[DB] Inserted {users_inserted} users and {stats_inserted} stat records")
+    print(f"[DB] Inserted {len(meta_rows)} users and {len(stats)} stat records")
+
+def executemany_in_transaction(conn, sql, rows):
+    """Run executemany inside one explicit BEGIN/COMMIT (the connection is in autocommit mode).
+    
+    Returns:
+        int: Number of rows changed
+    """
+    cursor = conn.cursor()
+    cursor.execute('BEGIN')
+    try:
+        cursor.executemany(sql, rows)
+        changed = cursor.rowcount
+        cursor.execute('COMMIT')
+    except Exception:
+        cursor.execute('ROLLBACK')
+        raise
+    return changed
 
 def migrate_tracked_users(conn):
     """Migrate tracked users from text file to database."""
@@ -174,13 +218,11 @@ def migrate_tracked_users(conn):
             with open(tracked_file, 'r', encoding='utf-8') as f:
                 users = [line.strip() for line in f if line.strip()]
             
-            cursor = conn.cursor()
-            count = 0
-            for user in users:
-                cursor.execute('INSERT OR IGNORE INTO tracked_users (username) VALUES (?)', (user,))
-                if cursor.rowcount > 0:
-                    count += 1
-            conn.commit()
+            count = executemany_in_transaction(
+                conn,
+                'INSERT OR IGNORE INTO tracked_users (username) VALUES (?)',
+                ((user,) for user in users)
+            )
             print(f"[MIGRATE] Migrated {count} tracked users.")
         except Exception as e:
             print(f"[ERROR] Failed to migrate tracked users: {e}")
@@ -197,15 +239,11 @@ def migrate_json_data(conn):
             with open(links_file, 'r', encoding='utf-8') as f:
                 links = json.load(f)
             
-            cursor = conn.cursor()
-            count = 0
-            for username, discord_id in links.items():
-                cursor.execute('''
-                    INSERT OR REPLACE INTO user_links (username, discord_id)
-                    VALUES (?, ?)
-                ''', (username, str(discord_id)))
-                count += 1
-            conn.commit()
+            executemany_in_transaction(conn, '''
+                INSERT OR REPLACE INTO user_links (username, discord_id)
+                VALUES (?, ?)
+            ''', ((username, str(discord_id)) for username, discord_id in links.items()))
+            count = len(links)
             print(f"[MIGRATE] Migrated {count} user links.")
         except Exception as e:
             print(f"[ERROR] Failed to migrate user links: {e}")
@@ -218,15 +256,11 @@ def migrate_json_data(conn):
             with open(defaults_file, 'r', encoding='utf-8') as f:
                 defaults = json.load(f)
             
-            cursor = conn.cursor()
-            count = 0
-            for discord_id, username in defaults.items():
-                cursor.execute('''
-                    INSERT OR REPLACE INTO default_users (discord_id, username)
-                    VALUES (?, ?)
-                ''', (str(discord_id), username))
-                count += 1
-            conn.commit()
+            executemany_in_transaction(conn, '''
+                INSERT OR REPLACE INTO default_users (discord_id, username)
+                VALUES (?, ?)
+            ''', ((str(discord_id), username) for discord_id, username in defaults.items()))
+            count = len(defaults)
             print(f"[MIGRATE] Migrated {count} default users.")
         except Exception as e:
             print(f"[ERROR] Failed to migrate default users: {e}")
@@ -239,14 +273,12 @@ def migrate_json_data(conn):
             with open(streaks_file, 'r', encoding='utf-8') as f:
                 streaks = json.load(f)
             
-            cursor = conn.cursor()
-            count = 0
-            for username, data in streaks.items():
-                cursor.execute('''
-                    INSERT OR REPLACE INTO tracked_streaks 
-                    (username, winstreak, killstreak, last_wins, last_losses, last_kills, last_deaths)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', (
+            executemany_in_transaction(conn, '''
+                INSERT OR REPLACE INTO tracked_streaks 
+                (username, winstreak, killstreak, last_wins, last_losses, last_kills, last_deaths)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                (
                     username,
                     data.get('winstreak', 0),
                     data.get('killstreak', 0),
@@ -254,50 +286,49 @@ def migrate_json_data(conn):
                     data.get('last_losses', 0),
                     data.get('last_kills', 0),
                     data.get('last_deaths', 0)
-                ))
-                count += 1
-            conn.commit()
+                )
+                for username, data in streaks.items()
+            ))
+            count = len(streaks)
             print(f"[MIGRATE] Migrated {count} streak records.")
         except Exception as e:
             print(f"[ERROR] Failed to migrate streaks: {e}")
 
-def verify_conversion(conn, all_users_data):
+def verify_conversion(conn, user_meta, stats):
     """Verify that all data was converted correctly."""
     cursor = conn.cursor()
     
     print("\n[VERIFY] Checking data integrity...")
     
+    # Load the whole table once and compare in memory
+    cursor.execute('SELECT username, stat_name, lifetime, session, daily, yesterday, monthly FROM user_stats')
+    db_stats = {(u, s): (lt, se, da, ye, mo) for u, s, lt, se, da, ye, mo in cursor.fetchall()}
+    
     # Check user count
-    cursor.execute('SELECT COUNT(DISTINCT username) FROM user_stats')
-    db_user_count = cursor.fetchone()[0]
-    excel_user_count = len(all_users_data)
+    db_user_count = len({username for username, _ in db_stats})
+    excel_user_count = len(user_meta)
     
     print(f"  Users: Excel={excel_user_count}, DB={db_user_count} {'✓' if db_user_count == excel_user_count else '✗'}")
     
-    # Sample check: verify a few random stats
-    errors = 0
-    for username in list(all_users_data.keys())[:3]:  # Check first 3 users
-        for stat_name in list(all_users_data[username]['stats'].keys())[:3]:  # Check first 3 stats
-            cursor.execute('''
-                SELECT lifetime, session, daily, yesterday, monthly 
-                FROM user_stats 
-                WHERE username = ? AND stat_name = ?
-            ''', (username, stat_name))
-            
-            result = cursor.fetchone()
-            if result:
-                excel_data = all_users_data[username]['stats'][stat_name]
-                db_data = {'lifetime': result[0], 'session': result[1], 'daily': result[2], 
-                          'yesterday': result[3], 'monthly': result[4]}
-                
-                if excel_data != db_data:
-                    print(f"  [WARN] Mismatch for {username}.{stat_name}")
-                    errors += 1
+    # Full check: every converted stat must be present with identical values
+    excel_stats = {
+        (username, stat_name): tuple(periods)
+        for username, stat_name, *periods in stats.itertuples(index=False)
+    }
+    
+    missing = excel_stats.keys() - db_stats.keys()
+    mismatched = [key for key in excel_stats.keys() & db_stats.keys() if excel_stats[key] != db_stats[key]]
+    
+    for username, stat_name in sorted(missing):
+        print(f"  [WARN] Missing {username}.{stat_name}")
+    for username, stat_name in sorted(mismatched):
+        print(f"  [WARN] Mismatch for {username}.{stat_name}")
     
+    errors = len(missing) + len(mismatched)
     if errors == 0:
-        print("  Sample verification: All checks passed ✓")
+        print(f"  Full verification: All {len(excel_stats)} stats match ✓")
     else:
-        print(f"  Sample verification: {errors} errors found ✗")
+        print(f"  Full verification: {errors} errors found ✗")
     
     print("\n[VERIFY] Conversion complete!")
 
@@ -308,7 +339,8 @@ def main():
     print("=" * 60)
     
     parser = argparse.ArgumentParser(description="Convert Excel stats to SQLite database")
-    parser.add_argument("--force", action="store_true", help="Overwrite existing database without prompt")
+    parser.add_argument("--force", action="store_true",
+                        help="Overwrite existing database without prompt, re-importing stats.xlsx even if unchanged")
     args = parser.parse_args()
     
     # Check if database already exists
@@ -324,13 +356,24 @@ def main():
     print("[DB] Initializing database schema...")
     init_database(DB_FILE)
     
-    conn = sqlite3.connect(DB_FILE)
+    # Autocommit mode: bulk writes manage their own BEGIN/COMMIT
+    conn = sqlite3.connect(DB_FILE, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute(IMPORT_STATE_SQL)
     
-    # Extract data from Excel
+    # Extract data from Excel. This is the expensive step, so skip it when this exact
+    # version of the sheet (same size and mtime) was already imported.
     if EXCEL_FILE.exists():
-        all_users_data = extract_excel_data(EXCEL_FILE)
-        insert_data_to_db(conn, all_users_data)
-        verify_conversion(conn, all_users_data)
+        signature = excel_signature(EXCEL_FILE)
+        if not args.force and get_imported_excel_signature(conn) == signature:
+            print(f"[SKIP] {EXCEL_FILE} has not changed since it was last imported (use --force to re-import)")
+        else:
+            user_meta, stats = extract_excel_data(EXCEL_FILE)
+            insert_data_to_db(conn, user_meta, stats)
+            verify_conversion(conn, user_meta, stats)
+            set_imported_excel_signature(conn, signature)
     else:
         print(f"[WARN] {EXCEL_FILE} not found, skipping Excel import.")
     
@@ -5,14 +5,48 @@ Updated to support categorized stat tables (general_stats, sheep_stats, ctw_stat
 """
 
 import sqlite3
+import threading
 import time
+import weakref
 from pathlib import Path
-from typing import Dict, List, Optional, Set
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 from contextlib import contextmanager
 
 
 DB_FILE = Path(__file__).parent / "stats.db"
 
+# Applied to every connection. WAL lets readers run alongside the writer and,
+# with synchronous=NORMAL, only syncs on checkpoint instead of on every commit.
+CONNECTION_PRAGMAS = (
+    # Lets maintain_database() hand free pages back to the filesystem. Must come
+    # before journal_mode, which writes the header; only applies to new databases.
+    "PRAGMA auto_vacuum=INCREMENTAL",
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-20000",  # ~20 MB page cache
+    "PRAGMA busy_timeout=30000",
+    "PRAGMA mmap_size=268435456",  # 256 MB
+)
+
+# Most usernames bound into one "IN (...)" list, well under SQLITE_MAX_VARIABLE_NUMBER
+SQL_VARIABLE_BATCH = 500
+
+# Short-lived read caches for get_user_stats_with_deltas, get_user_meta,
+# get_discord_id and get_default_username.
+# Writes through this module invalidate entries immediately; the TTL bounds how
+# long a write from another process (api_get.py runs as a subprocess) goes unseen.
+# Callers that know another process just wrote (and keep what they read) should
+# call clear_read_caches() first.
+READ_CACHE_TTL = 2.0
+_stats_cache: Dict[str, tuple] = {}
+_meta_cache: Dict[str, tuple] = {}
+_discord_id_cache: Dict[str, tuple] = {}
+_default_username_cache: Dict[str, tuple] = {}
+
+# Per-thread connection cache used by get_db_connection
+_local = threading.local()
+
 # Define which stats belong to which category
 GENERAL_STATS = {'available_layers', 'experience', 'coins', 'playtime', 'level'}
 SHEEP_STATS = {
@@ -46,25 +80,178 @@ WW_STATS = {
     'ww_swordsman_assists', 'ww_swordsman_blocks_broken', 'ww_swordsman_wool_placed'
 }
 
+# Snapshot columns stored next to lifetime in every stat table
+SNAPSHOT_PERIODS = ('session', 'daily', 'yesterday', 'weekly', 'monthly')
+
+# tracked_streaks columns returned by the streak getters, in SELECT order
+STREAK_COLUMNS = ('winstreak', 'killstreak', 'last_wins', 'last_losses', 'last_kills', 'last_deaths')
+
+
+# Table of every explicitly listed stat. Built lowest precedence first so a name
+# listed in several sets maps to the same table as the original if/elif chain.
+_STAT_TO_TABLE = {
+    **dict.fromkeys(WW_STATS, 'ww_stats'),
+    **dict.fromkeys(CTW_STATS, 'ctw_stats'),
+    **dict.fromkeys(SHEEP_STATS, 'sheep_stats'),
+    **dict.fromkeys(GENERAL_STATS, 'general_stats'),
+}
+
 
 def get_stat_table(stat_name: str) -> str:
     """Determine which table a stat belongs to."""
-    if stat_name in GENERAL_STATS:
-        return 'general_stats'
-    elif stat_name in SHEEP_STATS:
-        return 'sheep_stats'
-    elif stat_name.startswith('ctw_') or stat_name in CTW_STATS:
+    table = _STAT_TO_TABLE.get(stat_name)
+    if table is not None:
+        return table
+    if stat_name.startswith('ctw_'):
         return 'ctw_stats'
-    elif stat_name.startswith('ww_') or stat_name in WW_STATS:
+    if stat_name.startswith('ww_'):
         return 'ww_stats'
-    else:
-        # Default to sheep_stats for backward compatibility
-        return 'sheep_stats'
+    # Default to sheep_stats for backward compatibility
+    return 'sheep_stats'
+
+
+# Stat tables, in the order get_stat_table checks them
+STAT_TABLES = ('general_stats', 'sheep_stats', 'ctw_stats', 'ww_stats')
+
+# One user's raw stat rows from every stat table in a single statement (?1 is the username)
+SELECT_USER_STATS_SQL = ' UNION ALL '.join(f'''
+    SELECT stat_name, lifetime, session, daily, yesterday, weekly, monthly
+    FROM {table}
+    WHERE username = ?1
+''' for table in STAT_TABLES)
+
+# Deltas (lifetime - snapshot) across all stat tables, computed by SQLite. init_database
+# compares this text with the stored definition in sqlite_master and only rebuilds the
+# view when they differ, since DROP/CREATE bumps the schema version and forces every
+# connection to re-prepare its cached statements.
+STATS_DELTAS_VIEW_SQL = 'CREATE VIEW stats_deltas AS' + ' UNION ALL'.join(f'''
+    SELECT username, stat_name,
+        COALESCE(lifetime, 0) AS lifetime,
+        COALESCE(lifetime, 0) - COALESCE(session, 0) AS session,
+        COALESCE(lifetime, 0) - COALESCE(daily, 0) AS daily,
+        COALESCE(lifetime, 0) - COALESCE(yesterday, 0) AS yesterday,
+        COALESCE(lifetime, 0) - COALESCE(weekly, 0) AS weekly,
+        COALESCE(lifetime, 0) - COALESCE(monthly, 0) AS monthly
+    FROM {table}''' for table in STAT_TABLES)
+
+# Stat UPSERT used by update_user_stats, one per table. Built once so every call
+# passes the exact same SQL text and hits the connection's statement cache
+# (cached_statements) instead of recompiling.
+UPSERT_STATS_SQL = {
+    table: f'''
+        INSERT INTO {table}
+        (username, stat_name, lifetime, session, daily, yesterday, weekly, monthly)
+        VALUES (?1, ?2, ?3, ?3, ?3, ?3, ?3, ?3)
+        ON CONFLICT(username, stat_name) DO UPDATE SET
+            lifetime = excluded.lifetime,
+            session = COALESCE(?4, session, excluded.lifetime),
+            daily = COALESCE(?5, daily, excluded.lifetime),
+            yesterday = COALESCE(?6, yesterday, excluded.lifetime),
+            weekly = COALESCE(?7, weekly, excluded.lifetime),
+            monthly = COALESCE(?8, monthly, excluded.lifetime)
+        -- Leave rows that would not change alone so unchanged stats don't dirty pages
+        WHERE lifetime IS NOT excluded.lifetime
+            OR session IS NOT COALESCE(?4, session, excluded.lifetime)
+            OR daily IS NOT COALESCE(?5, daily, excluded.lifetime)
+            OR yesterday IS NOT COALESCE(?6, yesterday, excluded.lifetime)
+            OR weekly IS NOT COALESCE(?7, weekly, excluded.lifetime)
+            OR monthly IS NOT COALESCE(?8, monthly, excluded.lifetime)
+    '''
+    for table in STAT_TABLES
+}
+
+
+def _batched(items: List[str], size: int):
+    """Yield successive lists of at most size items."""
+    for i in range(0, len(items), size):
+        yield list(items[i:i + size])
+
+
+def _cache_get(cache: Dict[str, tuple], key: str):
+    """Return the cached value for key if it is younger than READ_CACHE_TTL, else None."""
+    entry = cache.get(key)
+    if entry is not None and time.monotonic() - entry[0] < READ_CACHE_TTL:
+        return entry[1]
+    return None
+
+
+def _invalidate_user(username: str):
+    """Drop cached reads for a user (stats are keyed by exact name, metadata case-insensitively)."""
+    _stats_cache.pop(username, None)
+    _meta_cache.pop(username.lower(), None)
+
+
+def clear_read_caches(username: Optional[str] = None):
+    """Drop cached reads so the next read goes to the database.
+    
+    Writes made through this module already invalidate their entries. Call this
+    after another process (e.g. an api_get.py subprocess) has written, or after
+    changing these tables with SQL of your own.
+    
+    Args:
+        username: Only drop this user's stats, metadata and Discord link (any casing);
+            clears every cache when None
+    """
+    if username is None:
+        _stats_cache.clear()
+        _meta_cache.clear()
+        _discord_id_cache.clear()
+        _default_username_cache.clear()
+        return
+    # Stats are cached by exact name, so drop every casing of this user
+    for cached_name in [name for name in _stats_cache if name.lower() == username.lower()]:
+        _stats_cache.pop(cached_name, None)
+    _invalidate_user(username)
+    _discord_id_cache.pop(username.lower(), None)
+
+
+def _open_connection(path: str) -> sqlite3.Connection:
+    """Open and configure a connection for the per-thread cache."""
+    # check_same_thread=False only so _close_connections can close it from whichever
+    # thread releases the cache; each connection is otherwise used by the thread that opened it.
+    # isolation_level="IMMEDIATE" makes the implicit BEGIN before the first write a
+    # BEGIN IMMEDIATE, so every write transaction takes the write lock up front and
+    # concurrent writers wait on busy_timeout instead of failing on a lock upgrade.
+    # The statement cache is sized to hold every distinct query in this module
+    # (several are generated per stat table), so none get evicted and re-prepared.
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level="IMMEDIATE",
+                           cached_statements=256)
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def _close_connections(connections: Dict[str, sqlite3.Connection]):
+    """Close one thread's cached connections."""
+    for conn in list(connections.values()):
+        try:
+            # Cheap when nothing changed; refreshes planner statistics when it did
+            conn.execute("PRAGMA optimize")
+            conn.close()
+        except sqlite3.Error:
+            pass
+    connections.clear()
+
+
+class _ThreadConnections:
+    """One thread's cached connections and get_db_connection nesting depth per path."""
+    
+    def __init__(self):
+        self.connections: Dict[str, sqlite3.Connection] = {}
+        self.depth: Dict[str, int] = {}
+        # Thread-local values are released when their thread ends, so worker and
+        # asyncio.to_thread threads don't leave connections open behind them.
+        # weakref.finalize also runs this at interpreter exit for live threads.
+        weakref.finalize(self, _close_connections, self.connections)
 
 
 @contextmanager
 def get_db_connection(db_path: Optional[Path] = None):
-    """Context manager for database connections with automatic cleanup.
+    """Context manager for database connections.
+    
+    Connections are opened once per thread and database path, then reused, so
+    the page cache stays warm between calls. Work left uncommitted when the
+    outermost block exits is rolled back, as closing the connection used to do.
     
     Args:
         db_path: Optional custom path to database file
@@ -72,13 +259,22 @@ def get_db_connection(db_path: Optional[Path] = None):
     Yields:
         sqlite3.Connection: Database connection object
     """
-    path = db_path or DB_FILE
-    conn = sqlite3.connect(str(path))
-    conn.row_factory = sqlite3.Row  # Enable dict-like access
+    path = str(db_path or DB_FILE)
+    cache = getattr(_local, 'cache', None)
+    if cache is None:
+        cache = _local.cache = _ThreadConnections()
+    
+    conn = cache.connections.get(path)
+    if conn is None:
+        conn = cache.connections[path] = _open_connection(path)
+    
+    cache.depth[path] = cache.depth.get(path, 0) + 1
     try:
         yield conn
     finally:
-        conn.close()
+        cache.depth[path] -= 1
+        if cache.depth[path] == 0 and conn.in_transaction:
+            conn.rollback()
 
 
 def init_database(db_path: Optional[Path] = None):
@@ -108,14 +304,55 @@ def init_database(db_path: Optional[Path] = None):
                 )
             ''')
             
-            # Create indexes for faster lookups
-            cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_username ON {table}(username)')
-            cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_stat_name ON {table}(stat_name)')
+            # The (username, stat_name) primary key already serves every username lookup,
+            # and nothing queries by stat_name alone, so these indexes only cost writes
+            cursor.execute(f'DROP INDEX IF EXISTS idx_{table}_username')
+            cursor.execute(f'DROP INDEX IF EXISTS idx_{table}_stat_name')
+        
+        # Registry of every username that has stats, so listing users reads one row
+        # per user instead of deduplicating every stat row of the four stat tables
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'users'")
+        if cursor.fetchone() is None:
+            # First run against this database: create and backfill from the stat tables
+            # in one transaction, so an interrupted init can't leave an empty registry.
+            # Writers keep it in sync from then on.
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS users (
+                    username TEXT PRIMARY KEY
+                )
+            ''')
+            cursor.execute('''
+                INSERT OR IGNORE INTO users (username)
+                SELECT username FROM general_stats
+                UNION
+                SELECT username FROM sheep_stats
+                UNION
+                SELECT username FROM ctw_stats
+                UNION
+                SELECT username FROM ww_stats
+            ''')
+            conn.commit()
+        # Case-insensitive lookups (username = ? COLLATE NOCASE) probe this index
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_username_nocase ON users(username COLLATE NOCASE)')
+        
+        # Rebuild the deltas view only when it is missing or its definition changed
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'view' AND name = 'stats_deltas'")
+        row = cursor.fetchone()
+        if row is None or row[0] != STATS_DELTAS_VIEW_SQL:
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('DROP VIEW IF EXISTS stats_deltas')
+            cursor.execute(STATS_DELTAS_VIEW_SQL)
+            conn.commit()
+        
+        # Same for the legacy user_stats table written by convert_to_db.py
+        cursor.execute('DROP INDEX IF EXISTS idx_username')
+        cursor.execute('DROP INDEX IF EXISTS idx_stat_name')
         
         # User metadata table - stores level, icon, colors, etc.
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS user_meta (
-                username TEXT PRIMARY KEY,
+                username TEXT PRIMARY KEY COLLATE NOCASE,
                 level INTEGER DEFAULT 0,
                 icon TEXT DEFAULT '',
                 ign_color TEXT DEFAULT NULL,
@@ -165,8 +402,20 @@ def init_database(db_path: Optional[Path] = None):
         # Create indexes for other tables
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_discord_id ON user_links(discord_id)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_default_discord ON default_users(discord_id)')
+        # Lets LOWER(username) = LOWER(?) lookups on databases created before
+        # user_meta.username was declared COLLATE NOCASE use an index
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_user_meta_username_lower ON user_meta(LOWER(username))')
+        # Same for the username = ? COLLATE NOCASE lookups on the link and tracking tables
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_user_links_username_nocase ON user_links(username COLLATE NOCASE)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_tracked_users_username_nocase ON tracked_users(username COLLATE NOCASE)')
         
         conn.commit()
+        
+        # Give the query planner statistics once; PRAGMA optimize keeps them current after that
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+        if cursor.fetchone() is None:
+            cursor.execute('ANALYZE')
+            conn.commit()
 
 
 def get_all_usernames() -> List[str]:
@@ -177,18 +426,8 @@ def get_all_usernames() -> List[str]:
     """
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        # Get usernames from any of the stat tables
-        cursor.execute('''
-            SELECT DISTINCT username FROM (
-                SELECT username FROM general_stats
-                UNION
-                SELECT username FROM sheep_stats
-                UNION
-                SELECT username FROM ctw_stats
-                UNION
-                SELECT username FROM ww_stats
-            ) ORDER BY username
-        ''')
+        # The users registry mirrors the stat tables; its primary key is already sorted
+        cursor.execute('SELECT username FROM users ORDER BY username')
         return [row[0] for row in cursor.fetchall()]
 
 
@@ -205,27 +444,19 @@ def get_user_stats(username: str) -> Dict[str, Dict[str, float]]:
     with get_db_connection() as conn:
         cursor = conn.cursor()
         
-        stats = {}
-        tables = ['general_stats', 'sheep_stats', 'ctw_stats', 'ww_stats']
-        
-        for table in tables:
-            cursor.execute(f'''
-                SELECT stat_name, lifetime, session, daily, yesterday, weekly, monthly
-                FROM {table}
-                WHERE username = ?
-            ''', (username,))
-            
-            for row in cursor.fetchall():
-                stats[row[0]] = {
-                    'lifetime': row[1] or 0,
-                    'session': row[2] or 0,
-                    'daily': row[3] or 0,
-                    'yesterday': row[4] or 0,
-                    'weekly': row[5] or 0,
-                    'monthly': row[6] or 0
-                }
+        cursor.execute(SELECT_USER_STATS_SQL, (username,))
         
-        return stats
+        return {
+            stat_name: {
+                'lifetime': lifetime or 0,
+                'session': session or 0,
+                'daily': daily or 0,
+                'yesterday': yesterday or 0,
+                'weekly': weekly or 0,
+                'monthly': monthly or 0
+            }
+            for stat_name, lifetime, session, daily, yesterday, weekly, monthly in cursor.fetchall()
+        }
 
 
 def get_user_meta(username: str) -> Optional[Dict]:
@@ -237,6 +468,10 @@ def get_user_meta(username: str) -> Optional[Dict]:
     Returns:
         Dict with metadata or None if not found
     """
+    cached = _cache_get(_meta_cache, username.lower())
+    if cached is not None:
+        return dict(cached)
+    
     with get_db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute('''
@@ -247,14 +482,17 @@ def get_user_meta(username: str) -> Optional[Dict]:
         row = cursor.fetchone()
         
         if row:
-            return {
-                'level': row[0],
-                'icon': row[1],
-                'ign_color': row[2],
-                'guild_tag': row[3],
-                'guild_hex': row[4],
-                'rank': row[5]
+            level, icon, ign_color, guild_tag, guild_hex, rank = row
+            meta = {
+                'level': level,
+                'icon': icon,
+                'ign_color': ign_color,
+                'guild_tag': guild_tag,
+                'guild_hex': guild_hex,
+                'rank': rank
             }
+            _meta_cache[username.lower()] = (time.monotonic(), meta)
+            return dict(meta)
         return None
 
 
@@ -268,15 +506,15 @@ def get_all_user_meta() -> Dict[str, Dict]:
         cursor = conn.cursor()
         cursor.execute('SELECT username, level, icon, ign_color, guild_tag, guild_hex, rank FROM user_meta')
         return {
-            row['username']: {
-                'level': row['level'],
-                'icon': row['icon'],
-                'ign_color': row['ign_color'],
-                'guild_tag': row['guild_tag'],
-                'guild_hex': row['guild_hex'],
-                'rank': row['rank']
+            username: {
+                'level': level,
+                'icon': icon,
+                'ign_color': ign_color,
+                'guild_tag': guild_tag,
+                'guild_hex': guild_hex,
+                'rank': rank
             }
-            for row in cursor.fetchall()
+            for username, level, icon, ign_color, guild_tag, guild_hex, rank in cursor.fetchall()
         }
 
 
@@ -300,95 +538,38 @@ def update_user_stats(username: str, stats: Dict[str, float],
                            have snapshots set to lifetime value to make initial deltas = lifetime
     """
     snapshot_sections = snapshot_sections or set()
-    new_stat_categories = new_stat_categories or set()
     
     with get_db_connection() as conn:
         cursor = conn.cursor()
         
         # Check if user already exists (case-insensitive) and get proper casing
-        cursor.execute('''
-            SELECT DISTINCT username FROM (
-                SELECT username FROM general_stats
-                UNION
-                SELECT username FROM sheep_stats
-                UNION
-                SELECT username FROM ctw_stats
-                UNION
-                SELECT username FROM ww_stats
-            ) WHERE LOWER(username) = LOWER(?) LIMIT 1
-        ''', (username,))
+        cursor.execute('SELECT username FROM users WHERE username = ? COLLATE NOCASE LIMIT 1', (username,))
         existing_user = cursor.fetchone()
         if existing_user:
             # Use existing casing to prevent duplicates
             username = existing_user[0]
         
+        # Group rows per table so each table is written with one executemany.
+        # A snapshot column gets the lifetime value when that period is being
+        # snapshotted, otherwise NULL so the UPSERT keeps the stored snapshot.
+        rows_by_table = {}
         for stat_name, lifetime_value in stats.items():
-            # Determine which table this stat belongs to
             table = get_stat_table(stat_name)
-            
-            # Determine if this is a "new" stat category
-            is_new_category = False
-            if table == 'ctw_stats' and 'ctw' in new_stat_categories:
-                is_new_category = True
-            elif table == 'ww_stats' and 'ww' in new_stat_categories:
-                is_new_category = True
-            
-            # Get existing record or create new one
-            cursor.execute(f'''
-                SELECT session, daily, yesterday, weekly, monthly
-                FROM {table}
-                WHERE username = ? AND stat_name = ?
-            ''', (username, stat_name))
-            
-            existing = cursor.fetchone()
-            if existing:
-                # Existing stat - keep current snapshots unless we're updating them
-                session_snap = existing[0] if existing[0] is not None else lifetime_value
-                daily_snap = existing[1] if existing[1] is not None else lifetime_value
-                yesterday_snap = existing[2] if existing[2] is not None else lifetime_value
-                weekly_snap = existing[3] if existing[3] is not None else lifetime_value
-                monthly_snap = existing[4] if existing[4] is not None else lifetime_value
-            else:
-                # New stat - decide how to initialize snapshots
-                if is_new_category:
-                    # For NEW categories (CTW/WW on first API call), set all snapshots to lifetime
-                    # This makes deltas = lifetime (showing all progress since start)
-                    session_snap = lifetime_value
-                    daily_snap = lifetime_value
-                    yesterday_snap = lifetime_value
-                    weekly_snap = lifetime_value
-                    monthly_snap = lifetime_value
-                else:
-                    # For existing categories (sheep wars), initialize to lifetime
-                    # This makes initial deltas = 0, which is correct for a new stat
-                    session_snap = lifetime_value
-                    daily_snap = lifetime_value
-                    yesterday_snap = lifetime_value
-                    weekly_snap = lifetime_value
-                    monthly_snap = lifetime_value
-            
-            # Update snapshots if explicitly requested
-            if "session" in snapshot_sections:
-                session_snap = lifetime_value
-            if "daily" in snapshot_sections:
-                daily_snap = lifetime_value
-            if "yesterday" in snapshot_sections:
-                yesterday_snap = lifetime_value
-            if "weekly" in snapshot_sections:
-                weekly_snap = lifetime_value
-            if "monthly" in snapshot_sections:
-                monthly_snap = lifetime_value
-            
-            # Insert or update - store SNAPSHOTS, not deltas
-            # Deltas are calculated on read
-            cursor.execute(f'''
-                INSERT OR REPLACE INTO {table}
-                (username, stat_name, lifetime, session, daily, yesterday, weekly, monthly)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (username, stat_name, lifetime_value, 
-                  session_snap, daily_snap, yesterday_snap, weekly_snap, monthly_snap))
+            rows_by_table.setdefault(table, []).append((
+                username, stat_name, lifetime_value,
+                *(lifetime_value if period in snapshot_sections else None for period in SNAPSHOT_PERIODS)
+            ))
+        
+        # Store SNAPSHOTS, not deltas - deltas are calculated on read.
+        # New stats (including whole new categories from new_stat_categories) start
+        # with every snapshot at lifetime, so their initial deltas are 0.
+        if rows_by_table:
+            cursor.execute('INSERT OR IGNORE INTO users (username) VALUES (?)', (username,))
+        for table, rows in rows_by_table.items():
+            cursor.executemany(UPSERT_STATS_SQL[table], rows)
         
         conn.commit()
+    _invalidate_user(username)
 
 
 def get_user_stats_with_deltas(username: str) -> Dict[str, Dict[str, float]]:
@@ -404,38 +585,86 @@ def get_user_stats_with_deltas(username: str) -> Dict[str, Dict[str, float]]:
     Returns:
         Dict mapping stat_name to dict with lifetime and delta values
     """
+    cached = _cache_get(_stats_cache, username)
+    if cached is None:
+        cached = _load_user_stats_with_deltas(username)
+        _stats_cache[username] = (time.monotonic(), cached)
+    # Copy so callers can't modify the cached entry
+    return {stat_name: dict(values) for stat_name, values in cached.items()}
+
+
+def _load_user_stats_with_deltas(username: str) -> Dict[str, Dict[str, float]]:
+    """Read one user's stats with deltas from the database (uncached)."""
     with get_db_connection() as conn:
         cursor = conn.cursor()
+        # Deltas are computed by the stats_deltas view
+        cursor.execute('''
+            SELECT stat_name, lifetime, session, daily, yesterday, weekly, monthly
+            FROM stats_deltas
+            WHERE username = ?
+        ''', (username,))
         
-        stats = {}
-        tables = ['general_stats', 'sheep_stats', 'ctw_stats', 'ww_stats']
+        return {
+            stat_name: {
+                'lifetime': lifetime,
+                'session': session,
+                'daily': daily,
+                'yesterday': yesterday,
+                'weekly': weekly,
+                'monthly': monthly
+            }
+            for stat_name, lifetime, session, daily, yesterday, weekly, monthly in cursor.fetchall()
+        }
+
+
+def get_users_stats_with_deltas(usernames: List[str],
+                                stat_names: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Dict[str, float]]]:
+    """Get stats with calculated deltas for many users at once.
+    
+    Equivalent to calling get_user_stats_with_deltas for each username, but
+    reads each table once per batch of users instead of once per user.
+    
+    Args:
+        usernames: Usernames to query (exact casing, as returned by get_all_usernames)
+        stat_names: Optional stat names to load; other stats are neither read nor
+                    returned (e.g. a leaderboard only needs its metric)
         
-        for table in tables:
+    Returns:
+        Dict mapping username to the get_user_stats_with_deltas result
+        ({} for users with no stats)
+    """
+    results = {username: {} for username in usernames}
+    
+    stat_filter = ''
+    stat_params = []
+    if stat_names is not None:
+        stat_params = list(dict.fromkeys(stat_names))
+        if not stat_params:
+            return results
+        stat_filter = f"AND stat_name IN ({','.join('?' * len(stat_params))})"
+    
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        for batch in _batched(usernames, SQL_VARIABLE_BATCH):
+            placeholders = ','.join('?' * len(batch))
             cursor.execute(f'''
-                SELECT stat_name, lifetime, session, daily, yesterday, weekly, monthly
-                FROM {table}
-                WHERE username = ?
-            ''', (username,))
+                SELECT username, stat_name, lifetime, session, daily, yesterday, weekly, monthly
+                FROM stats_deltas
+                WHERE username IN ({placeholders}) {stat_filter}
+            ''', [*batch, *stat_params])
             
-            for row in cursor.fetchall():
-                stat_name = row[0]
-                lifetime = row[1] or 0
-                session_snap = row[2] or 0
-                daily_snap = row[3] or 0
-                yesterday_snap = row[4] or 0
-                weekly_snap = row[5] or 0
-                monthly_snap = row[6] or 0
-                
-                stats[stat_name] = {
+            for username, stat_name, lifetime, session, daily, yesterday, weekly, monthly in cursor.fetchall():
+                results[username][stat_name] = {
                     'lifetime': lifetime,
-                    'session': lifetime - session_snap,
-                    'daily': lifetime - daily_snap,
-                    'yesterday': lifetime - yesterday_snap,
-                    'weekly': lifetime - weekly_snap,
-                    'monthly': lifetime - monthly_snap
+                    'session': session,
+                    'daily': daily,
+                    'yesterday': yesterday,
+                    'weekly': weekly,
+                    'monthly': monthly
                 }
-        
-        return stats
+    
+    return results
 
 
 def update_user_meta(username: str, level: Optional[int] = None, icon: Optional[str] = None,
@@ -451,41 +680,25 @@ def update_user_meta(username: str, level: Optional[int] = None, icon: Optional[
     with get_db_connection() as conn:
         cursor = conn.cursor()
         
-        # Check if user exists
-        cursor.execute('SELECT username FROM user_meta WHERE LOWER(username) = LOWER(?)', (username,))
-        row = cursor.fetchone()
+        # Update every existing casing in place; NULL parameters keep the stored
+        # value and "" clears a text value. A plain ON CONFLICT UPSERT can't be used
+        # because older databases declare user_meta.username without NOCASE.
+        cursor.execute('''
+            UPDATE user_meta SET
+                level = COALESCE(?2, level),
+                icon = COALESCE(?3, icon),
+                ign_color = CASE WHEN ?4 IS NULL THEN ign_color ELSE NULLIF(?4, '') END,
+                guild_tag = CASE WHEN ?5 IS NULL THEN guild_tag ELSE NULLIF(?5, '') END,
+                guild_hex = CASE WHEN ?6 IS NULL THEN guild_hex ELSE NULLIF(?6, '') END,
+                rank = COALESCE(?7, rank)
+            WHERE LOWER(username) = LOWER(?1)
+        ''', (
+            username, level, icon, ign_color,
+            str(guild_tag) if guild_tag is not None else None,
+            guild_hex, rank
+        ))
         
-        if row:
-            # Update existing record - only update fields that are not None
-            target_username = row['username']
-            updates = []
-            params = []
-            
-            if level is not None:
-                updates.append("level = ?")
-                params.append(level)
-            if icon is not None:
-                updates.append("icon = ?")
-                params.append(icon)
-            if ign_color is not None:
-                updates.append("ign_color = ?")
-                params.append(ign_color if ign_color != "" else None)
-            if guild_tag is not None:
-                updates.append("guild_tag = ?")
-                val = guild_tag if guild_tag != "" else None
-                params.append(str(val) if val is not None else None)
-            if guild_hex is not None:
-                updates.append("guild_hex = ?")
-                params.append(guild_hex if guild_hex != "" else None)
-            if rank is not None:
-                updates.append("rank = ?")
-                params.append(rank)
-            
-            if updates:
-                params.append(target_username)
-                sql = f"UPDATE user_meta SET {', '.join(updates)} WHERE username = ?"
-                cursor.execute(sql, params)
-        else:
+        if cursor.rowcount == 0:
             # Insert new record
             cursor.execute('''
                 INSERT INTO user_meta 
@@ -502,43 +715,58 @@ def update_user_meta(username: str, level: Optional[int] = None, icon: Optional[
             ))
         
         conn.commit()
+    _invalidate_user(username)
 
 
-def rotate_daily_to_yesterday(usernames: List[str]) -> Dict[str, bool]:
+def rotate_daily_to_yesterday(usernames: Optional[List[str]] = None) -> Dict[str, bool]:
     """Copy daily snapshot to yesterday snapshot for specified users.
     
     This is called before the daily refresh to preserve yesterday's stats.
     
     Args:
-        usernames: List of usernames to rotate
+        usernames: List of usernames to rotate (default: all tracked users)
         
     Returns:
         Dict mapping username to success status
     """
-    results = {}
-    
     with get_db_connection() as conn:
         cursor = conn.cursor()
         tables = ['general_stats', 'sheep_stats', 'ctw_stats', 'ww_stats']
         
-        for username in usernames:
-            try:
-                # Copy daily column to yesterday column for all stats in all tables
+        # With no list, SQLite picks the tracked users itself (one UPDATE per table);
+        # their names are only needed for the returned statuses
+        tracked_only = usernames is None
+        if tracked_only:
+            cursor.execute('SELECT username FROM tracked_users ORDER BY username')
+            usernames = [row[0] for row in cursor.fetchall()]
+        
+        try:
+            if tracked_only:
                 for table in tables:
                     cursor.execute(f'''
                         UPDATE {table}
                         SET yesterday = daily
-                        WHERE username = ?
-                    ''', (username,))
-                
-                results[username] = True
-            except Exception as e:
-                print(f"[ERROR] Failed to rotate {username}: {e}")
-                results[username] = False
-        
-        conn.commit()
-    
-    return results
+                        WHERE username IN (SELECT username FROM tracked_users)
+                    ''')
+            else:
+                # Copy daily column to yesterday column for all stats in all tables,
+                # one set-based UPDATE per table and batch of users
+                for batch in _batched(usernames, SQL_VARIABLE_BATCH):
+                    placeholders = ','.join('?' * len(batch))
+                    for table in tables:
+                        cursor.execute(f'''
+                            UPDATE {table}
+                            SET yesterday = daily
+                            WHERE username IN ({placeholders})
+                        ''', batch)
+            conn.commit()
+            for username in usernames:
+                _invalidate_user(username)
+            return {username: True for username in usernames}
+        except Exception as e:
+            conn.rollback()
+            print(f"[ERROR] Failed to rotate daily to yesterday: {e}")
+            return {username: False for username in usernames}
 
 
 def reset_weekly_snapshots(usernames: List[str]) -> Dict[str, bool]:
@@ -552,30 +780,29 @@ def reset_weekly_snapshots(usernames: List[str]) -> Dict[str, bool]:
     Returns:
         Dict mapping username to success status
     """
-    results = {}
-    
     with get_db_connection() as conn:
         cursor = conn.cursor()
         tables = ['general_stats', 'sheep_stats', 'ctw_stats', 'ww_stats']
         
-        for username in usernames:
-            try:
-                # Set weekly snapshot to current lifetime value for all stats in all tables
+        try:
+            # Set weekly snapshot to current lifetime value for all stats in all tables,
+            # one set-based UPDATE per table and batch of users
+            for batch in _batched(usernames, SQL_VARIABLE_BATCH):
+                placeholders = ','.join('?' * len(batch))
                 for table in tables:
                     cursor.execute(f'''
                         UPDATE {table}
                         SET weekly = lifetime
-                        WHERE username = ?
-                    ''', (username,))
-                
-                results[username] = True
-            except Exception as e:
-                print(f"[ERROR] Failed to reset weekly for {username}: {e}")
-                results[username] = False
-        
-        conn.commit()
-    
-    return results
+                        WHERE username IN ({placeholders})
+                    ''', batch)
+            conn.commit()
+            for username in usernames:
+                _invalidate_user(username)
+            return {username: True for username in usernames}
+        except Exception as e:
+            conn.rollback()
+            print(f"[ERROR] Failed to reset weekly snapshots: {e}")
+            return {username: False for username in usernames}
 
 
 def user_exists(username: str) -> bool:
@@ -589,15 +816,9 @@ def user_exists(username: str) -> bool:
     """
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        # Check all stat tables
-        for table in ['general_stats', 'sheep_stats', 'ctw_stats', 'ww_stats']:
-            cursor.execute(f'''
-                SELECT COUNT(*) FROM {table} WHERE LOWER(username) = LOWER(?)
-            ''', (username,))
-            count = cursor.fetchone()[0]
-            if count > 0:
-                return True
-        return False
+        # The users registry lists everyone with stats in any stat table
+        cursor.execute('SELECT 1 FROM users WHERE username = ? COLLATE NOCASE LIMIT 1', (username,))
+        return cursor.fetchone() is not None
 
 
 def delete_user(username: str):
@@ -609,10 +830,17 @@ def delete_user(username: str):
     with get_db_connection() as conn:
         cursor = conn.cursor()
         tables = ['general_stats', 'sheep_stats', 'ctw_stats', 'ww_stats']
+        # Resolve every stored casing through the users registry so each stat table
+        # is probed by its primary key instead of scanned with LOWER(username)
         for table in tables:
-            cursor.execute(f'DELETE FROM {table} WHERE LOWER(username) = LOWER(?)', (username,))
+            cursor.execute(f'''
+                DELETE FROM {table}
+                WHERE username IN (SELECT username FROM users WHERE username = ? COLLATE NOCASE)
+            ''', (username,))
+        cursor.execute('DELETE FROM users WHERE username = ? COLLATE NOCASE', (username,))
         cursor.execute('DELETE FROM user_meta WHERE LOWER(username) = LOWER(?)', (username,))
         conn.commit()
+    clear_read_caches(username)
 
 
 def get_database_stats() -> Dict:
@@ -624,25 +852,16 @@ def get_database_stats() -> Dict:
     with get_db_connection() as conn:
         cursor = conn.cursor()
         
-        # Get unique usernames across all stat tables
+        # User count from the users registry and total stat count, in one statement
         cursor.execute('''
-            SELECT COUNT(DISTINCT username) FROM (
-                SELECT username FROM general_stats
-                UNION
-                SELECT username FROM sheep_stats
-                UNION
-                SELECT username FROM ctw_stats
-                UNION
-                SELECT username FROM ww_stats
-            )
+            SELECT
+                (SELECT COUNT(*) FROM users),
+                (SELECT COUNT(*) FROM general_stats)
+                + (SELECT COUNT(*) FROM sheep_stats)
+                + (SELECT COUNT(*) FROM ctw_stats)
+                + (SELECT COUNT(*) FROM ww_stats)
         ''')
-        user_count = cursor.fetchone()[0]
-        
-        # Get total stat count
-        total_stats = 0
-        for table in ['general_stats', 'sheep_stats', 'ctw_stats', 'ww_stats']:
-            cursor.execute(f'SELECT COUNT(*) FROM {table}')
-            total_stats += cursor.fetchone()[0]
+        user_count, total_stats = cursor.fetchone()
         
         return {
             'users': user_count,
@@ -662,14 +881,40 @@ def backup_database(backup_path: Path) -> bool:
         True if successful, False otherwise
     """
     try:
-        import shutil
-        shutil.copy2(DB_FILE, backup_path)
+        # The online backup API copies a consistent snapshot that includes
+        # pages still in the WAL, which a plain file copy of stats.db would miss.
+        # Copying in steps lets writers in between.
+        with get_db_connection() as conn:
+            backup_conn = sqlite3.connect(str(backup_path))
+            try:
+                conn.backup(backup_conn, pages=1000, sleep=0.01)
+            finally:
+                backup_conn.close()
         return True
     except Exception as e:
         print(f"[ERROR] Database backup failed: {e}")
         return False
 
 
+def maintain_database() -> bool:
+    """Refresh query planner statistics and release free pages.
+    
+    Meant to be called periodically by long-running processes (the bot).
+    
+    Returns:
+        True if successful, False otherwise
+    """
+    try:
+        with get_db_connection() as conn:
+            conn.execute('PRAGMA optimize')
+            # Frees at most 1000 pages per call; a no-op unless auto_vacuum is INCREMENTAL
+            conn.execute('PRAGMA incremental_vacuum(1000)').fetchall()
+        return True
+    except sqlite3.Error as e:
+        print(f"[ERROR] Database maintenance failed: {e}")
+        return False
+
+
 # ============================================================================
 # User Links Functions (username <-> Discord ID mappings)
 # ============================================================================
@@ -683,11 +928,18 @@ def get_discord_id(username: str) -> Optional[str]:
     Returns:
         Discord ID or None if not found
     """
+    cached = _cache_get(_discord_id_cache, username.lower())
+    if cached is not None:
+        return cached
+    
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute('SELECT discord_id FROM user_links WHERE LOWER(username) = LOWER(?)', (username,))
+        cursor.execute('SELECT discord_id FROM user_links WHERE username = ? COLLATE NOCASE', (username,))
         row = cursor.fetchone()
-        return row['discord_id'] if row else None
+        if row:
+            _discord_id_cache[username.lower()] = (time.monotonic(), row[0])
+            return row[0]
+        return None
 
 
 def set_discord_link(username: str, discord_id: str):
@@ -705,6 +957,7 @@ def set_discord_link(username: str, discord_id: str):
             ON CONFLICT(username) DO UPDATE SET discord_id = excluded.discord_id
         ''', (username.lower(), discord_id))
         conn.commit()
+    _discord_id_cache.pop(username.lower(), None)
 
 
 def get_all_user_links() -> Dict[str, str]:
@@ -716,7 +969,7 @@ def get_all_user_links() -> Dict[str, str]:
     with get_db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute('SELECT username, discord_id FROM user_links')
-        return {row['username']: row['discord_id'] for row in cursor.fetchall()}
+        return dict(cursor)
 
 
 # ============================================================================
@@ -732,11 +985,18 @@ def get_default_username(discord_id: str) -> Optional[str]:
     Returns:
         Username or None if not found
     """
+    cached = _cache_get(_default_username_cache, discord_id)
+    if cached is not None:
+        return cached
+    
     with get_db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute('SELECT username FROM default_users WHERE discord_id = ?', (discord_id,))
         row = cursor.fetchone()
-        return row['username'] if row else None
+        if row:
+            _default_username_cache[discord_id] = (time.monotonic(), row[0])
+            return row[0]
+        return None
 
 
 def set_default_username(discord_id: str, username: str):
@@ -754,6 +1014,7 @@ def set_default_username(discord_id: str, username: str):
             ON CONFLICT(discord_id) DO UPDATE SET username = excluded.username
         ''', (discord_id, username))
         conn.commit()
+    _default_username_cache.pop(discord_id, None)
 
 
 def get_all_default_users() -> Dict[str, str]:
@@ -765,7 +1026,7 @@ def get_all_default_users() -> Dict[str, str]:
     with get_db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute('SELECT discord_id, username FROM default_users')
-        return {row['discord_id']: row['username'] for row in cursor.fetchall()}
+        return dict(cursor)
 
 
 # ============================================================================
@@ -789,14 +1050,7 @@ def get_tracked_streaks(username: str) -> Optional[Dict]:
         ''', (username,))
         row = cursor.fetchone()
         if row:
-            return {
-                'winstreak': row['winstreak'],
-                'killstreak': row['killstreak'],
-                'last_wins': row['last_wins'],
-                'last_losses': row['last_losses'],
-                'last_kills': row['last_kills'],
-                'last_deaths': row['last_deaths']
-            }
+            return dict(zip(STREAK_COLUMNS, row))
         return None
 
 
@@ -807,9 +1061,25 @@ def update_tracked_streaks(username: str, streak_data: Dict):
         username: Minecraft username
         streak_data: Dictionary with streak data
     """
+    update_tracked_streaks_bulk([(username, streak_data)])
+
+
+def update_tracked_streaks_bulk(items: Iterable[Tuple[str, Dict]]):
+    """Update streak tracking data for many usernames in one transaction.
+    
+    Args:
+        items: (username, streak_data) pairs, e.g. dict.items() of username -> streak data
+    """
+    rows = [
+        (username, *(streak_data.get(column, 0) for column in STREAK_COLUMNS))
+        for username, streak_data in items
+    ]
+    if not rows:
+        return
+    
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute('''
+        cursor.executemany('''
             INSERT INTO tracked_streaks 
             (username, winstreak, killstreak, last_wins, last_losses, last_kills, last_deaths)
             VALUES (?, ?, ?, ?, ?, ?, ?)
@@ -820,15 +1090,11 @@ def update_tracked_streaks(username: str, streak_data: Dict):
                 last_losses = excluded.last_losses,
                 last_kills = excluded.last_kills,
                 last_deaths = excluded.last_deaths
-        ''', (
-            username,
-            streak_data.get('winstreak', 0),
-            streak_data.get('killstreak', 0),
-            streak_data.get('last_wins', 0),
-            streak_data.get('last_losses', 0),
-            streak_data.get('last_kills', 0),
-            streak_data.get('last_deaths', 0)
-        ))
+            -- Unchanged streaks (the common case between refreshes) are not rewritten
+            WHERE (winstreak, killstreak, last_wins, last_losses, last_kills, last_deaths)
+                IS NOT (excluded.winstreak, excluded.killstreak, excluded.last_wins,
+                        excluded.last_losses, excluded.last_kills, excluded.last_deaths)
+        ''', rows)
         conn.commit()
 
 
@@ -844,17 +1110,7 @@ def get_all_tracked_streaks() -> Dict[str, Dict]:
             SELECT username, winstreak, killstreak, last_wins, last_losses, last_kills, last_deaths
             FROM tracked_streaks
         ''')
-        result = {}
-        for row in cursor.fetchall():
-            result[row['username']] = {
-                'winstreak': row['winstreak'],
-                'killstreak': row['killstreak'],
-                'last_wins': row['last_wins'],
-                'last_losses': row['last_losses'],
-                'last_kills': row['last_kills'],
-                'last_deaths': row['last_deaths']
-            }
-        return result
+        return {username: dict(zip(STREAK_COLUMNS, streaks)) for username, *streaks in cursor.fetchall()}
 
 
 # ============================================================================
@@ -872,13 +1128,13 @@ def add_tracked_user(username: str) -> bool:
     """
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        # Check if user already exists (case-insensitive)
-        cursor.execute('SELECT username FROM tracked_users WHERE LOWER(username) = LOWER(?)', (username,))
-        if cursor.fetchone():
-            return False
-        
-        # Add the user with the provided casing
-        cursor.execute('INSERT INTO tracked_users (username) VALUES (?)', (username,))
+        # Add the user with the provided casing unless any casing of it is already
+        # tracked; a single statement, so the check and the insert can't race
+        cursor.execute('''
+            INSERT INTO tracked_users (username)
+            SELECT ?1
+            WHERE NOT EXISTS (SELECT 1 FROM tracked_users WHERE username = ?1 COLLATE NOCASE)
+        ''', (username,))
         conn.commit()
         return cursor.rowcount > 0
 
@@ -894,7 +1150,7 @@ def remove_tracked_user(username: str):
     """
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute('DELETE FROM tracked_users WHERE LOWER(username) = LOWER(?)', (username,))
+        cursor.execute('DELETE FROM tracked_users WHERE username = ? COLLATE NOCASE', (username,))
         conn.commit()
         return cursor.rowcount > 0
 
@@ -910,7 +1166,7 @@ def is_tracked_user(username: str) -> bool:
     """
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute('SELECT 1 FROM tracked_users WHERE LOWER(username) = LOWER(?)', (username,))
+        cursor.execute('SELECT 1 FROM tracked_users WHERE username = ? COLLATE NOCASE', (username,))
         return cursor.fetchone() is not None
 
 
@@ -923,7 +1179,7 @@ def get_tracked_users() -> List[str]:
     with get_db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute('SELECT username FROM tracked_users ORDER BY username')
-        return [row['username'] for row in cursor.fetchall()]
+        return [row[0] for row in cursor.fetchall()]
 
 
 def set_tracked_users(usernames: List[str]):
@@ -935,6 +1191,6 @@ def set_tracked_users(usernames: List[str]):
     with get_db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute('DELETE FROM tracked_users')
-        for username in usernames:
-            cursor.execute('INSERT OR IGNORE INTO tracked_users (username) VALUES (?)', (username,))
+        cursor.executemany('INSERT OR IGNORE INTO tracked_users (username) VALUES (?)',
+                           [(username,) for username in usernames])
         conn.commit()
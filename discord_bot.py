@@ -13,6 +13,9 @@ from db_helper import (
     get_database_stats,
     get_user_stats,
     get_user_stats_with_deltas,
+    get_users_stats_with_deltas,
+    maintain_database,
+    clear_read_caches,
     get_user_meta,
     get_all_user_meta,
     update_user_meta,
@@ -25,6 +28,7 @@ from db_helper import (
     get_all_default_users,
     get_tracked_streaks,
     update_tracked_streaks,
+    update_tracked_streaks_bulk,
     get_all_tracked_streaks,
     add_tracked_user,
     remove_tracked_user,
@@ -185,6 +189,18 @@ class StatsCache:
         self.last_mtime = 0
         self.lock = asyncio.Lock()
         self.db_path = DB_FILE
+        # In WAL mode commits land in stats.db-wal and only reach stats.db on checkpoint
+        self.wal_path = DB_FILE.with_name(DB_FILE.name + "-wal")
+
+    def _db_mtime(self) -> float:
+        """Latest modification time of the database, including its write-ahead log."""
+        mtimes = []
+        for path in (self.db_path, self.wal_path):
+            try:
+                mtimes.append(path.stat().st_mtime)
+            except FileNotFoundError:
+                pass  # The WAL is removed when the last connection closes
+        return max(mtimes, default=0)
 
     async def get_data(self):
         """Get cached data, reloading from database if it has changed."""
@@ -192,7 +208,7 @@ class StatsCache:
             return {}
 
         try:
-            current_mtime = self.db_path.stat().st_mtime
+            current_mtime = self._db_mtime()
             
             # Double-check locking to prevent multiple reloads
             if current_mtime > self.last_mtime:
@@ -214,13 +230,17 @@ class StatsCache:
         cache = {}
 
         try:
+            # A reload means another process changed the database, so skip cached reads
+            clear_read_caches()
             # Get all usernames
             usernames = get_all_usernames()
+            # Fetch every user's stats in one pass instead of one query set per user
+            all_stats = get_users_stats_with_deltas(usernames)
             
             for username in usernames:
                 try:
                     # Get stats with deltas
-                    stats = get_user_stats_with_deltas(username)
+                    stats = all_stats.get(username, {})
                     
                     # Get metadata
                     meta_db = get_user_meta(username)
@@ -271,7 +291,9 @@ class StatsCache:
             if not self.data:
                 self.data = {}
             
-            # Get meta from database to ensure colors/guilds are preserved
+            # Get meta from database to ensure colors/guilds are preserved. api_get.py
+            # just wrote it from another process, so skip the short-lived read cache.
+            clear_read_caches(username)
             meta_db = get_user_meta(username)
             
             # Calculate meta
@@ -297,8 +319,7 @@ class StatsCache:
                 print(f"[STREAK] Failed to update streaks for {username}: {e}")
             
             # Update mtime to prevent the next get_data call from reloading
-            if self.db_path.exists():
-                self.last_mtime = self.db_path.stat().st_mtime
+            self.last_mtime = self._db_mtime()
             
             return user_cache
 
@@ -307,8 +328,7 @@ class StatsCache:
         async with self.lock:
             print("[CACHE] Forcing cache refresh...")
             self.data = await asyncio.to_thread(self._load_from_database)
-            if self.db_path.exists():
-                self.last_mtime = self.db_path.stat().st_mtime
+            self.last_mtime = self._db_mtime()
             print(f"[CACHE] Refresh complete. Cached {len(self.data)} users.")
 
 STATS_CACHE = StatsCache()
@@ -423,27 +443,34 @@ def _to_number(val):
 # Helper function to run scripts with proper working directory
 def run_script(script_name, args, timeout=30):
     """Run a Python script in the bot directory with proper working directory"""
-    return subprocess.run(
-        [sys.executable, script_name, *args],
-        cwd=str(BOT_DIR),
-        capture_output=True,
-        text=True,
-        encoding='utf-8',
-        errors='replace',
-        timeout=timeout
-    )
+    try:
+        return subprocess.run(
+            [sys.executable, script_name, *args],
+            cwd=str(BOT_DIR),
+            capture_output=True,
+            text=True,
+            encoding='utf-8',
+            errors='replace',
+            timeout=timeout
+        )
+    finally:
+        # The script may have written stats.db; don't serve reads cached before it ran
+        clear_read_caches()
 
 def run_script_batch(script_name, args):
     """Run a batch script with extended timeout (5 minutes for large user lists)"""
-    return subprocess.run(
-        [sys.executable, script_name, *args],
-        cwd=str(BOT_DIR),
-        capture_output=True,
-        text=True,
-        encoding='utf-8',
-        errors='replace',
-        timeout=300  # 5 minutes for batch operations
-    )
+    try:
+        return subprocess.run(
+            [sys.executable, script_name, *args],
+            cwd=str(BOT_DIR),
+            capture_output=True,
+            text=True,
+            encoding='utf-8',
+            errors='replace',
+            timeout=300  # 5 minutes for batch operations
+        )
+    finally:
+        clear_read_caches()
 
 async def ensure_user_cached(ign: str, timeout: int = 60) -> tuple[bool, str]:
     """
@@ -2355,8 +2382,7 @@ def load_tracked_streaks() -> dict:
 
 def save_tracked_streaks(data: dict):
     try:
-        for username, streak_data in data.items():
-            update_tracked_streaks(username, streak_data)
+        update_tracked_streaks_bulk(data.items())
     except Exception as e:
         print(f"[STREAK] Failed to save streaks to database: {e}")
 
@@ -2395,8 +2421,8 @@ def _get_lifetime_value(stats: dict, key: str) -> int:
 
 
 def update_streaks_from_stats(username: str, processed_stats: dict) -> bool:
-    streaks = load_tracked_streaks()
-    entry = streaks.get(username)
+    # Only this user's row is read and written, not the whole streaks table
+    entry = get_tracked_streaks(username)
     if not entry:
         return False
 
@@ -2436,27 +2462,27 @@ def update_streaks_from_stats(username: str, processed_stats: dict) -> bool:
         "last_kills": kills,
         "last_deaths": deaths,
     })
-    streaks[username] = entry
-    save_tracked_streaks(streaks)
+    update_tracked_streaks(username, entry)
     return True
 
 
 def initialize_streak_entry(username: str, processed_stats: dict):
-    streaks = load_tracked_streaks()
     wins = _get_lifetime_value(processed_stats, "wins")
     losses = _get_lifetime_value(processed_stats, "losses")
     kills = _get_lifetime_value(processed_stats, "kills")
     deaths = _get_lifetime_value(processed_stats, "deaths")
 
-    streaks[username] = {
-        "winstreak": 0,
-        "killstreak": 0,
-        "last_wins": wins,
-        "last_losses": losses,
-        "last_kills": kills,
-        "last_deaths": deaths,
-    }
-    save_tracked_streaks(streaks)
+    try:
+        update_tracked_streaks(username, {
+            "winstreak": 0,
+            "killstreak": 0,
+            "last_wins": wins,
+            "last_losses": losses,
+            "last_kills": kills,
+            "last_deaths": deaths,
+        })
+    except Exception as e:
+        print(f"[STREAK] Failed to save streaks to database: {e}")
 
 def load_user_links():
     """Load username -> Discord user ID mappings from database"""
@@ -3088,9 +3114,10 @@ def inline_backup_fallback():
 
 
 async def scheduler_loop():
-    """Automatic scheduler for daily and monthly snapshots, plus hourly backups"""
+    """Automatic scheduler for daily and monthly snapshots, hourly backups and database maintenance"""
     last_snapshot_run = None
     last_backup_hour = None
+    last_maintenance_slot = None
     
     while True:
         now = datetime.datetime.now(tz=CREATOR_TZ)
@@ -3223,6 +3250,14 @@ async def scheduler_loop():
                 
                 last_snapshot_run = today
         
+        # Database maintenance (PRAGMA optimize + incremental vacuum) - every 15 minutes
+        if now.minute % 15 == 0:
+            current_slot = (now.date(), now.hour, now.minute)
+            if last_maintenance_slot != current_slot:
+                if not await asyncio.to_thread(maintain_database):
+                    print(f"[SCHEDULER] Database maintenance failed at {now.strftime('%I:%M %p')}")
+                last_maintenance_slot = current_slot
+        
         await asyncio.sleep(20)
 
 # Helper class for stats tab view
@@ -4484,6 +4519,10 @@ def _load_leaderboard_data_from_excel(metric: str, category: str = "sheepwars"):
     try:
         # Get all users from database
         usernames = get_all_usernames()
+        # Only the metric, its kdr/wlr components and the level are read below
+        all_stats = get_users_stats_with_deltas(
+            usernames, {metric, "level", "prestige level", "kills", "deaths", "wins", "losses"}
+        )
         
         # Load user colors
         user_colors = load_user_colors()
@@ -4494,11 +4533,9 @@ def _load_leaderboard_data_from_excel(metric: str, category: str = "sheepwars"):
         
         for username in usernames:
             try:
-                # Get stats with deltas
-                stats_dict = get_user_stats_with_deltas(username)
-                
-                if not stats_dict:
-                    continue
+                # Get stats with deltas. Every username from the registry has stats,
+                # even when none of the requested ones, so nobody is skipped here.
+                stats_dict = all_stats.get(username, {})
                 
                 # Get metadata
                 user_meta = user_colors.get(username.lower(), {})
@@ -4809,6 +4846,7 @@ def _load_ratio_leaderboard_data_from_excel(metric: str, category: str = "sheepw
     try:
         # Get all users from database
         usernames = get_all_usernames()
+        all_stats = get_users_stats_with_deltas(usernames)
         
         # Load user colors
         user_colors = load_user_colors()
@@ -4820,7 +4858,7 @@ def _load_ratio_leaderboard_data_from_excel(metric: str, category: str = "sheepw
         for username in usernames:
             try:
                 # Get stats with deltas
-                stats_dict = get_user_stats_with_deltas(username)
+                stats_dict = all_stats.get(username, {})
                 
                 if not stats_dict:
                     continue
@@ -5792,6 +5830,8 @@ async def remove_tracked(interaction: discord.Interaction, ign: str):
             removed_meta = cursor.rowcount > 0
             
             conn.commit()
+        # These deletes bypass db_helper, so drop its cached link and metadata for the user
+        clear_read_caches(ign)
         
         # Also try to delete the sheet
         removed_sheet = delete_user_sheet(ign)
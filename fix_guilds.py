@@ -1,7 +1,7 @@
 import time
 import sys
 from pathlib import Path
-from db_helper import get_all_usernames, update_user_meta
+from db_helper import init_database, get_all_usernames, update_user_meta
 from api_get import read_api_key_file, get_uuid, get_hypixel_guild, extract_guild_info
 
 def fix_guilds():
@@ -11,6 +11,8 @@ def fix_guilds():
         print("[ERROR] No API key found in API_KEY.txt")
         return
 
+    # Make sure tables added since the database was created (e.g. the users registry) exist
+    init_database()
     usernames = get_all_usernames()
     print(f"[GUILD FIX] Found {len(usernames)} users to check.")
 
@@ -138,8 +138,7 @@ def migrate_tracked_streaks():
     with open(file_path, 'r') as f:
         data = json.load(f)
     
-    for username, streak_data in data.items():
-        db_helper.update_tracked_streaks(username, streak_data)
+    db_helper.update_tracked_streaks_bulk(data.items())
     
     print(f"  ✅ Migrated {len(data)} tracked streaks")
     return len(data)
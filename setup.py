@@ -2,35 +2,47 @@ import urllib.request
 import zipfile
 import os
 import shutil
+import sys
+
+FONT_FILES = ['DejaVuSans.ttf', 'DejaVuSans-Bold.ttf']
+
+fonts_dir = os.path.dirname(__file__) + r'\fonts'
+
+# Nothing to do if the fonts were already installed by an earlier run
+if all(os.path.exists(os.path.join(fonts_dir, font_file)) for font_file in FONT_FILES):
+    print('Fonts already present, skipping download.')
+    sys.exit(0)
 
 # Download the fonts
 url = 'https://downloads.sourceforge.net/project/dejavu/dejavu/2.37/dejavu-fonts-ttf-2.37.zip'
 zip_path = os.path.expandvars(r'%TEMP%\dejavu-fonts.zip')
-extract_path = os.path.expandvars(r'%TEMP%\dejavu-extract')
 
 print('Downloading DejaVu fonts...')
-urllib.request.urlretrieve(url, zip_path)
+try:
+    # Stream the archive to disk in 64 KB chunks
+    with urllib.request.urlopen(url) as response, open(zip_path, 'wb') as zip_file:
+        shutil.copyfileobj(response, zip_file, length=64 * 1024)
 
-print('Extracting fonts...')
-with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-    zip_ref.extractall(extract_path)
+    # Zip member paths always use forward slashes
+    src_dir = 'dejavu-fonts-ttf-2.37/ttf/'
 
-# Copy the fonts
-fonts_dir = os.path.dirname(__file__) + r'\fonts'
-src_dir = os.path.join(extract_path, 'dejavu-fonts-ttf-2.37', 'ttf')
-
-# Create fonts directory if it doesn't exist
-os.makedirs(fonts_dir, exist_ok=True)
-
-print('Copying fonts...')
-for font_file in ['DejaVuSans.ttf', 'DejaVuSans-Bold.ttf']:
-    src = os.path.join(src_dir, font_file)
-    dst = os.path.join(fonts_dir, font_file)
-    if os.path.exists(src):
-        shutil.copy2(src, dst)
-        print(f'Copied {font_file}')
-
-# Cleanup
-os.remove(zip_path)
-shutil.rmtree(extract_path)
+    # Create fonts directory if it doesn't exist
+    os.makedirs(fonts_dir, exist_ok=True)
+
+    print('Extracting fonts...')
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        members = set(zip_ref.namelist())
+        # Stream only the two fonts we use straight into fonts_dir instead of
+        # extracting the whole archive to a temp folder first
+        for font_file in FONT_FILES:
+            src = src_dir + font_file
+            dst = os.path.join(fonts_dir, font_file)
+            if src in members:
+                with zip_ref.open(src) as src_file, open(dst, 'wb') as dst_file:
+                    shutil.copyfileobj(src_file, dst_file)
+                print(f'Copied {font_file}')
+finally:
+    # Cleanup, even if the download or extraction failed part way
+    if os.path.exists(zip_path):
+        os.remove(zip_path)
 print('Done!')
@@ -5,6 +5,8 @@ This is useful for migrating or merging data between databases.
 """
 
 import sqlite3
+from itertools import groupby
+from operator import itemgetter
 from pathlib import Path
 import argparse
 
@@ -33,53 +35,57 @@ def transfer_stats(source_db='backup_stats.db', dest_db='stats.db'):
     try:
         # Connect to both databases
         print(f"[DB] Connecting to source: {source_db}")
+        # Default row factory: rows come back as plain tuples that executemany takes as is
         source_conn = sqlite3.connect(str(source_path))
-        source_conn.row_factory = sqlite3.Row
         
         print(f"[DB] Connecting to destination: {dest_db}")
-        dest_conn = sqlite3.connect(str(dest_path))
+        # Autocommit mode: the transfer's transaction is managed explicitly below
+        dest_conn = sqlite3.connect(str(dest_path), isolation_level=None)
+        dest_conn.execute('PRAGMA synchronous=NORMAL')
         
         source_cursor = source_conn.cursor()
         dest_cursor = dest_conn.cursor()
         
-        # Get all usernames from source
-        source_cursor.execute('SELECT DISTINCT username FROM user_stats ORDER BY username')
-        usernames = [row[0] for row in source_cursor.fetchall()]
+        # Metadata is small enough to load in one query; stat rows are streamed below
+        source_cursor.execute('''
+            SELECT username, level, icon, ign_color, guild_tag, guild_hex
+            FROM user_meta
+        ''')
+        meta_by_user = {row[0]: row[1:] for row in source_cursor.fetchall()}
         
-        print(f"[INFO] Found {len(usernames)} users in source database")
+        source_cursor.execute('SELECT COUNT(DISTINCT username) FROM user_stats')
+        user_count = source_cursor.fetchone()[0]
+        
+        print(f"[INFO] Found {user_count} users in source database")
         
         transferred_users = 0
         transferred_stats = 0
         
-        for username in usernames:
+        # Take the write lock once for the whole transfer
+        dest_conn.execute('BEGIN IMMEDIATE')
+        
+        # One ordered pass over the source stats, grouped per user as rows arrive,
+        # so only one user's rows are held in memory at a time
+        source_cursor.execute('''
+            SELECT username, stat_name, lifetime, session, daily, yesterday, monthly
+            FROM user_stats
+            ORDER BY username
+        ''')
+        
+        for username, rows in groupby(source_cursor, key=itemgetter(0)):
             print(f"\n[TRANSFER] Processing user: {username}")
             
-            # Get all stats for this user from source
-            source_cursor.execute('''
-                SELECT stat_name, lifetime, session, daily, yesterday, monthly
-                FROM user_stats
-                WHERE username = ?
-            ''', (username,))
-            
-            stats = source_cursor.fetchall()
-            
-            # Get metadata for this user from source
-            source_cursor.execute('''
-                SELECT level, icon, ign_color, guild_tag, guild_hex
-                FROM user_meta
-                WHERE username = ?
-            ''', (username,))
-            
-            meta = source_cursor.fetchone()
+            # Source rows already have the destination's column order, username first
+            stats = list(rows)
+            meta = meta_by_user.get(username)
             
             # Insert/update stats in destination
-            for stat in stats:
-                dest_cursor.execute('''
-                    INSERT OR REPLACE INTO user_stats 
-                    (username, stat_name, lifetime, session, daily, yesterday, monthly)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', (username, stat[0], stat[1], stat[2], stat[3], stat[4], stat[5]))
-                transferred_stats += 1
+            dest_cursor.executemany('''
+                INSERT OR REPLACE INTO user_stats 
+                (username, stat_name, lifetime, session, daily, yesterday, monthly)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', stats)
+            transferred_stats += len(stats)
             
             # Insert/update metadata in destination
             if meta:
@@ -87,13 +93,13 @@ def transfer_stats(source_db='backup_stats.db', dest_db='stats.db'):
                     INSERT OR REPLACE INTO user_meta 
                     (username, level, icon, ign_color, guild_tag, guild_hex)
                     VALUES (?, ?, ?, ?, ?, ?)
-                ''', (username, meta[0], meta[1], meta[2], meta[3], meta[4]))
+                ''', (username, *meta))
             
             print(f"  [OK] Transferred {len(stats)} stats for {username}")
             transferred_users += 1
         
         # Commit changes
-        dest_conn.commit()
+        dest_conn.execute('COMMIT')
         
         print(f"\n{'='*60}")
         print(f"[SUCCESS] Transfer complete!")